@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+"""
+pipeline is Python code to time each stage of rendering and sending an event
+using the recorded weather data in the examples directory.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import email_utilities  # noqa: E402
+import forecast_parser  # noqa: E402
+import forecast_table  # noqa: E402
+import weather_cache  # noqa: E402
+import weather_scheduler  # noqa: E402
+
+
+COMPARE = 'Compare two result files and print the change of each benchmark'
+DAYS = sorted(weather_scheduler.WEEK, key=weather_scheduler.WEEK.get)
+DESCRIPTION = 'Time each stage of the weather scheduler pipeline.'
+EXAMPLES = os.path.join(ROOT, 'examples')
+# The example data and a time inside its forecast window.
+ASTRONOMY = '2017-03-12-astronomy.json'
+HOURLY10DAY = ['2017-03-06-hourly10day.json', '2017-03-12-hourly10day.json']
+NOW = datetime.datetime(2017, 3, 12, 12)
+TARGET = datetime.datetime(2017, 3, 13, 18)
+FILTER = 'Only run the benchmarks with names that contain this string'
+OUTPUT = 'The path and name of the JSON file to store the results'
+REPEAT = 'The number of times to repeat each benchmark'
+
+
+def command_line():
+    """Parse the arguments from the command line and run the benchmarks."""
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('-c', '--compare', nargs=2,
+                        help='{0} [{1}]'.format(COMPARE, None))
+    parser.add_argument('-f', '--filter', default='',
+                        help='{0} [{1}]'.format(FILTER, None))
+    parser.add_argument('-n', '--repeat', type=int, default=5,
+                        help='{0} [{1}]'.format(REPEAT, 5))
+    parser.add_argument('-o', '--output',
+                        help='{0} [{1}]'.format(OUTPUT, None))
+    arguments = parser.parse_args()
+    if arguments.compare:
+        compare(*arguments.compare)
+        return
+    results = run(arguments.repeat, arguments.filter)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if arguments.output:
+        with open(arguments.output, 'w') as writer:
+            writer.write(text)
+    else:
+        print(text)
+
+
+def compare(old_path, new_path):
+    """Print the ratio of the new median to the old median per benchmark."""
+    with open(old_path, 'r') as reader:
+        old = json.load(reader)['benchmarks']
+    with open(new_path, 'r') as reader:
+        new = json.load(reader)['benchmarks']
+    for name in sorted(set(old) & set(new)):
+        ratio = new[name]['median'] / old[name]['median']
+        print('{0:40} {1:12.6f} {2:12.6f} {3:7.2f}x'.format(
+            name, old[name]['median'], new[name]['median'], ratio))
+
+
+@contextlib.contextmanager
+def template_cache(directory):
+    """Use a new template environment with the bytecode in the directory in
+    the body of the with statement, then restore the previous ones."""
+    saved = weather_scheduler.TEMPLATE_CACHE, weather_scheduler._environment
+    weather_scheduler.TEMPLATE_CACHE = directory
+    weather_scheduler._environment = None
+    try:
+        yield
+    finally:
+        weather_scheduler.TEMPLATE_CACHE, weather_scheduler._environment = \
+            saved
+
+
+def get_commit():
+    """Return the git commit of the source being measured, or None."""
+    try:
+        process = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.DEVNULL,
+                                 universal_newlines=True, check=True)
+        return process.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(function, repeat, number=None):
+    """Return a dict of the seconds per call of the function, calling it
+    number times in each of repeat runs. When number is None it is chosen so
+    each run takes at least 0.1 seconds."""
+    if number is None:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                function()
+            if time.perf_counter() - start >= 0.1:
+                break
+            number *= 2
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        samples.append((time.perf_counter() - start) / number)
+    return {'min': min(samples),
+            'median': statistics.median(samples),
+            'mean': statistics.mean(samples),
+            'number': number,
+            'repeat': repeat}
+
+
+def read_example(name):
+    """Return the text of an example file."""
+    with open(os.path.join(EXAMPLES, name), 'r') as reader:
+        return reader.read()
+
+
+class StubResponse(object):
+    """A response from the recorded example data."""
+
+    def __init__(self, text):
+        self.status_code = 200
+        self.headers = {}
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.url = 'http://localhost/'
+
+
+class StubClient(object):
+    """A weather client that answers from the recorded example data."""
+
+    def __init__(self, texts):
+        self.texts = texts
+
+    def fetch(self, key, location, features, validators=None):
+        return {feature: StubResponse(self.texts[feature])
+                for feature in features}
+
+
+def get_benchmarks(directory):
+    """Return a dict of benchmark name to a function with no arguments."""
+    benchmarks = {}
+    astronomy_text = read_example(ASTRONOMY)
+    astronomy = json.loads(astronomy_text)
+    for name in HOURLY10DAY:
+        text = read_example(name)
+        size = name[:10]
+        data = json.loads(text)
+        table = forecast_table.ForecastTable(data)
+        benchmarks['json_decode_' + size] = \
+            lambda text=text: json.loads(text)
+        benchmarks['stream_parse_' + size] = \
+            lambda text=text: forecast_parser.parse_hourly10day(
+                forecast_parser.iter_text(text))
+        benchmarks['stream_parse_until_' + size] = \
+            lambda text=text: forecast_parser.parse_hourly10day(
+                forecast_parser.iter_text(text), TARGET)
+        benchmarks['decode_hourly10day_' + size] = \
+            lambda text=text: forecast_parser.decode_hourly10day(text)
+        benchmarks['decode_hourly10day_until_' + size] = \
+            lambda text=text: forecast_parser.decode_hourly10day(text, TARGET)
+        benchmarks['forecast_table_' + size] = \
+            lambda data=data: forecast_table.ForecastTable(data)
+        benchmarks['update_context_dict_' + size] = \
+            lambda data=data: weather_scheduler.update_context(
+                {}, TARGET, astronomy, data)
+        benchmarks['update_context_table_' + size] = \
+            lambda table=table: weather_scheduler.update_context(
+                {}, TARGET, astronomy, table)
+
+    def compile_templates():
+        # A new environment and bytecode directory each time is a cold start.
+        with tempfile.TemporaryDirectory() as bytecode, \
+                template_cache(bytecode):
+            for day in DAYS:
+                weather_scheduler.get_template(day)
+    benchmarks['get_template_cold'] = compile_templates
+
+    # The other benchmarks use the environment of the run, see run().
+    templates = {day: weather_scheduler.get_template(day) for day in DAYS}
+
+    def load_bytecode():
+        # A new environment with the bytecode on disk is a new process.
+        with template_cache(weather_scheduler.TEMPLATE_CACHE):
+            for day in DAYS:
+                weather_scheduler.get_template(day)
+    benchmarks['get_template_bytecode'] = load_bytecode
+    benchmarks['get_template_warm'] = \
+        lambda: [weather_scheduler.get_template(day) for day in DAYS]
+
+    data = json.loads(read_example(HOURLY10DAY[1]))
+    context = weather_scheduler.get_event_context(
+        {'comment': 'Ride safe.'}, TARGET, 'MN/Rochester', astronomy, data)
+    for day in DAYS:
+        benchmarks['render_' + day] = \
+            lambda day=day: templates[day].render(context)
+
+    event_text = templates['monday'].render(context)
+    image = os.path.join(directory, 'route.png')
+    with open(image, 'wb') as writer:
+        # A PNG signature followed by 100 KB of data to encode.
+        writer.write(b'\x89PNG\r\n\x1a\n' + os.urandom(100 * 1024))
+    benchmarks['get_message_text'] = \
+        lambda: email_utilities.get_message(
+            'a@example.com', 'b@example.com', 'Ride', event_text,
+            None).as_bytes()
+    benchmarks['get_message_image'] = \
+        lambda: email_utilities.get_message(
+            'a@example.com', 'b@example.com', 'Ride', event_text,
+            image).as_bytes()
+
+    client = StubClient({'astronomy': astronomy_text,
+                         'hourly10day': read_example(HOURLY10DAY[1])})
+    # A time to live of zero requests the stubbed API on every run.
+    cache = weather_cache.ForecastCache(os.path.join(directory, 'cache'),
+                                        ttl={'astronomy': 0,
+                                             'hourly10day': 0})
+    benchmarks['schedule_event'] = \
+        lambda: weather_scheduler.schedule_event(
+            {'comment': 'Ride safe.'}, 'monday', 'KEY', 'MN/Rochester',
+            TARGET.time(), client=client, now=NOW, cache=cache)
+    return benchmarks
+
+
+def run(repeat, name_filter=''):
+    """Return a dict of the machine information and benchmark results."""
+    results = {'commit': get_commit(),
+               'python': platform.python_version(),
+               'machine': platform.machine(),
+               'benchmarks': {}}
+    with tempfile.TemporaryDirectory() as directory, \
+            template_cache(os.path.join(directory, 'bytecode')):
+        benchmarks = get_benchmarks(directory)
+        for name in sorted(benchmarks):
+            if name_filter in name:
+                results['benchmarks'][name] = measure(benchmarks[name],
+                                                      repeat)
+    return results
+
+
+if __name__ == '__main__':
+    command_line()
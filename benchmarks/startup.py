@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+"""
+startup is Python code to measure the cold start cost of the entry points.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+DESCRIPTION = 'Measure the import time and start up time of the modules.'
+MODULES = ['weather_scheduler', 'email_utilities']
+OUTPUT = 'The path and name of the JSON file to store the results'
+REPEAT = 'The number of times to start each process'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The commands to time from start to exit.
+COMMANDS = {'import_weather_scheduler': ['-c', 'import weather_scheduler'],
+            'import_email_utilities': ['-c', 'import email_utilities'],
+            'render_only_offline': ['weather_scheduler.py', '--offline',
+                                    '--render-only', '--output', os.devnull],
+            'python': ['-c', 'pass']}
+
+
+def command_line():
+    """Parse the arguments from the command line and run the benchmark."""
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('-n', '--repeat', type=int, default=10,
+                        help='{0} [{1}]'.format(REPEAT, 10))
+    parser.add_argument('-o', '--output',
+                        help='{0} [{1}]'.format(OUTPUT, None))
+    arguments = parser.parse_args()
+    results = run(arguments.repeat)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if arguments.output:
+        with open(arguments.output, 'w') as writer:
+            writer.write(text)
+    else:
+        print(text)
+
+
+def get_import_time(module):
+    """Return a dict of the cumulative microseconds -X importtime reports for
+    the module and each import made directly by the module."""
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                              'import {0}'.format(module)],
+                             cwd=ROOT, stderr=subprocess.PIPE,
+                             universal_newlines=True, check=True)
+    entries = []
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_time, cumulative, name = line[len('import time:'):].split('|')
+        # Each level of nesting is indented two more spaces.
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((depth, name.strip(), int(cumulative)))
+    times = {}
+    # The imports of a module are listed before the module itself.
+    for depth, name, cumulative in reversed(entries):
+        if depth == 0 and times:
+            break
+        if (depth == 0 and name == module) or (depth == 1 and times):
+            times[name] = cumulative
+    return times
+
+
+def get_wall_time(arguments, environment):
+    """Return the seconds to start a python process with the arguments."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + arguments, cwd=ROOT, check=True,
+                   env=environment, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def run(repeat):
+    """Return a dict of the median import and wall clock times."""
+    results = {'python': platform.python_version(),
+               'machine': platform.machine(),
+               'repeat': repeat,
+               'import_time_us': {},
+               'wall_time_s': {}}
+    for module in MODULES:
+        samples = [get_import_time(module) for _ in range(repeat)]
+        names = set().union(*samples)
+        results['import_time_us'][module] = {
+            name: statistics.median(sample.get(name, 0) for sample in samples)
+            for name in names}
+    with tempfile.TemporaryDirectory() as directory:
+        # Fill a forecast cache with the examples for the offline render.
+        sys.path.insert(0, ROOT)
+        import weather_cache
+        cache = weather_cache.ForecastCache(directory)
+        for feature in ['astronomy', 'hourly10day']:
+            path = os.path.join(ROOT, 'examples',
+                                '2017-03-12-{0}.json'.format(feature))
+            with open(path, 'r') as reader:
+                cache.put(feature, 'MN/Rochester', reader.read())
+        environment = dict(os.environ, WEATHER_CACHE=directory)
+        for name, arguments in COMMANDS.items():
+            samples = [get_wall_time(arguments, environment)
+                       for _ in range(repeat)]
+            results['wall_time_s'][name] = statistics.median(samples)
+    return results
+
+
+if __name__ == '__main__':
+    command_line()
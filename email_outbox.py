@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+"""
+email_outbox is Python code to spool email messages and deliver them later.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import email
+import email.policy
+import getpass
+import os
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+
+import email_utilities
+import weather_metrics
+
+
+BACKOFF = 30  # The seconds to wait after the first failed delivery.
+DESCRIPTION = 'Deliver the email messages waiting in the outbox directory.'
+DIRECTORY = os.getenv('WEATHER_OUTBOX',
+                      os.path.join(os.path.expanduser('~'), '.cache',
+                                   'weather_scheduler', 'outbox'))
+MAX_ATTEMPTS = 10  # The deliveries to try before moving a message to failed.
+MAX_BACKOFF = 60 * 60  # The most seconds to wait between deliveries.
+ONCE = 'Try to deliver the waiting messages once and exit'
+OUTBOX = 'The directory of the messages waiting to be delivered'
+
+
+def command_line():
+    """Parse the arguments from the command line and deliver the messages in
+    the outbox until interrupted."""
+    try:
+        parser = argparse.ArgumentParser(description=DESCRIPTION)
+        parser.add_argument('-d', '--directory', default=DIRECTORY,
+                            help='{0} [{1}]'.format(OUTBOX, DIRECTORY))
+        parser.add_argument('--once', action='store_true',
+                            help='{0} [{1}]'.format(ONCE, False))
+        parser.add_argument('-s', '--server',
+                            help='{0} [{1}]'.format(email_utilities.SERVER,
+                                                    None))
+        parser.add_argument('-p', '--port', type=int,
+                            help='{0} [{1}]'.format(email_utilities.PORT,
+                                                    None))
+        parser.add_argument('-u', '--username',
+                            help='{0} [{1}]'.format(email_utilities.USERNAME,
+                                                    None))
+        parser.add_argument('--password',
+                            help='{0} [{1}]'.format(email_utilities.PASSWORD,
+                                                    None))
+        arguments, extra = parser.parse_known_args()
+
+        password = arguments.password
+        if not password:
+            password = os.getenv('SMTP_PASSWORD')
+            if not password:
+                password = getpass.getpass(email_utilities.PASSWORD + ': ')
+
+        outbox = Outbox(arguments.directory)
+        with email_utilities.SMTPPool(arguments.server,
+                                      arguments.port,
+                                      arguments.username,
+                                      password) as pool:
+            if arguments.once:
+                outbox.drain(pool.send)
+            else:
+                worker = OutboxWorker(outbox, pool.send)
+                worker.start()
+                try:
+                    while worker.is_alive():
+                        worker.join(1)
+                except KeyboardInterrupt:
+                    worker.stop()
+                    worker.join()
+    except:
+        print('An error occurred delivering the outbox messages.')
+        print(traceback.print_exc())
+        exit(2)
+
+
+class Outbox(object):
+    """A directory of MIME messages waiting to be delivered. The number of
+    delivery attempts is in the file name and the modified time of the file
+    is when the next attempt is due."""
+
+    def __init__(self, directory=DIRECTORY, backoff=BACKOFF,
+                 max_backoff=MAX_BACKOFF, max_attempts=MAX_ATTEMPTS):
+        """Create the outbox directory if it does not exist.
+        :param str directory: The path to the directory to spool messages in.
+        :param float backoff: The seconds to wait after the first failure.
+        :param float max_backoff: The most seconds to wait between attempts.
+        :param int max_attempts: The attempts before a message has failed."""
+        self.directory = directory
+        self.failed = os.path.join(directory, 'failed')
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        os.makedirs(self.failed, exist_ok=True)
+
+    def put(self, message):
+        """Atomically write the message to the outbox and return the path."""
+        name = '{0:.6f}-{1}.0.eml'.format(time.time(), uuid.uuid4().hex)
+        path = os.path.join(self.directory, name)
+        handle, temp_path = tempfile.mkstemp(dir=self.directory,
+                                             suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as writer:
+                writer.write(message.as_bytes())
+            os.replace(temp_path, path)
+        except:
+            os.unlink(temp_path)
+            raise
+        return path
+
+    def get_due(self, now=None):
+        """Return the sorted paths of the messages that are due now and the
+        time the next message that is not due yet will be due, or None."""
+        if now is None:
+            now = time.time()
+        due = []
+        next_due = None
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.eml'):
+                modified = entry.stat().st_mtime
+                if modified <= now:
+                    due.append(entry.path)
+                elif next_due is None or modified < next_due:
+                    next_due = modified
+        return sorted(due), next_due
+
+    def drain(self, send, now=None):
+        """Call send with each message that is due, remove the delivered
+        messages and reschedule the others with exponential backoff. Return
+        the number of messages delivered."""
+        delivered = 0
+        for path in self.get_due(now)[0]:
+            with open(path, 'rb') as reader:
+                message = email.message_from_bytes(
+                    reader.read(), policy=email.policy.default)
+            try:
+                send(message)
+            except Exception:
+                print('Unable to deliver {0}'.format(path))
+                print(traceback.print_exc())
+                self.reschedule(path)
+            else:
+                os.unlink(path)
+                delivered += 1
+        return delivered
+
+    def reschedule(self, path):
+        """Count a failed attempt for the message at the path and set when it
+        is due again, or move it to the failed directory."""
+        weather_metrics.METRICS.increment('retries')
+        directory, name = os.path.split(path)
+        stem, attempts, extension = name.rsplit('.', 2)
+        attempts = int(attempts) + 1
+        if attempts >= self.max_attempts:
+            os.replace(path, os.path.join(self.failed, name))
+            return
+        delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+        due = time.time() + delay
+        new_path = os.path.join(directory, '{0}.{1}.{2}'.format(
+            stem, attempts, extension))
+        os.utime(path, (due, due))
+        os.replace(path, new_path)
+
+
+class OutboxWorker(threading.Thread):
+    """A thread that delivers the outbox messages as they become due."""
+
+    def __init__(self, outbox, send, interval=BACKOFF):
+        """Create a daemon thread that drains the outbox with send, checking
+        for new messages at least every interval seconds."""
+        super(OutboxWorker, self).__init__(name='outbox')
+        self.daemon = True
+        self.outbox = outbox
+        self.send = send
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._wake_event.clear()
+            try:
+                self.outbox.drain(self.send)
+                next_due = self.outbox.get_due()[1]
+            except Exception:
+                print('An error occurred draining the outbox.')
+                print(traceback.print_exc())
+                next_due = None
+            wait = self.interval
+            if next_due is not None:
+                wait = min(wait, max(0, next_due - time.time()))
+            self._wake_event.wait(wait)
+
+    def wake(self):
+        """Drain the outbox now, such as after a new message was put."""
+        self._wake_event.set()
+
+    def stop(self):
+        """Stop the thread after the current drain finishes."""
+        self._stop_event.set()
+        self._wake_event.set()
+
+
+if __name__ == '__main__':
+    command_line()
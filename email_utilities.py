@@ -19,90 +19,133 @@ limitations under the License.
 """
 
 import argparse
+import collections
+import functools
 import getpass
 import os
-import smtplib
 import sys
+import threading
+import time
 import traceback
 
-from email.mime.image import MIMEImage
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+# Outboxes and the scheduler import this module for its help strings, so
+# smtplib is only imported to connect and email.mime to build a message.
 
 
 DESCRIPTION = 'Methods to send an email from a Python program.'
 FROM = 'The string email address to send the email from'
+IDLE_TIMEOUT = 60  # The seconds a pooled connection can stay unused.
 IMAGE = 'The string path to an image to attach to the email'
+# The total size of the encoded image parts to keep in memory.
+IMAGE_CACHE_BYTES = 8 * 1024 * 1024
+OUTBOX = 'Write the message to the outbox directory to be delivered by ' \
+         'email_outbox.py instead of sending it now'
 PORT = 'The port to use when connecting to the SMTP server'
 PASSWORD = 'The password on the SMTP server'
+POOL_SIZE = 2  # The number of connections to keep open in a pool.
 RECIPIENTS = 'The comma separated email addresses to send the email to'
 SERVER = 'The SMTP server to connect with'
 SUBJECT = 'The string subject of the email message'
 TEXT = 'The main text of the email message'
+TEXT_FILE = 'The path to a file of the main text of the email message'
 USERNAME = 'The username to authenticate with the SMTP server'
 
+_image_cache = None  # The shared cache, created on get_image_cache().
+
 
 def command_line():
     """Parse the arguments from the command line."""
     try:
-        parser = argparse.ArgumentParser(description=DESCRIPTION)
-        parser.add_argument('-f', '--fromaddress',
-                            help='{0} [{1}]'.format(FROM, None))
-        parser.add_argument('-r', '--recipients',
-                            help='{0} [{1}]'.format(RECIPIENTS, None))
-        parser.add_argument('--subject',
-                            help='{0} [{1}]'.format(SUBJECT, None))
-        parser.add_argument('-i', '--image',
-                            help='{0} [{1}]'.format(IMAGE, None))
-        parser.add_argument('-s', '--server',
-                            help='{0} [{1}]'.format(SERVER, None))
-        parser.add_argument('--text',
-                            help='{0} [{1}]'.format(TEXT, None))
-        parser.add_argument('-p', '--port', type=int,
-                            help='{0} [{1}]'.format(PORT, None))
-        parser.add_argument('-u', '--username',
-                            help='{0} [{1}]'.format(USERNAME, None))
-        parser.add_argument('--password',
-                            help='{0} [{1}]'.format(PASSWORD, None))
-        arguments, extra = parser.parse_known_args()
-
+        arguments = parse_arguments()
+        text, text_is_path = arguments.text, False
+        if arguments.text_file:
+            text, text_is_path = arguments.text_file, True
         message = get_message(arguments.fromaddress,
                               arguments.recipients,
                               arguments.subject,
-                              arguments.text,
-                              arguments.image)
-
-        password = arguments.password
-        if not password:
-            password = os.getenv('SMTP_PASSWORD')
-            if not password:
-                password = getpass.getpass(PASSWORD + ': ')
-
-        send_tls_message(arguments.server,
-                         arguments.port,
-                         arguments.username,
-                         password,
-                         message)
+                              text,
+                              arguments.image,
+                              text_is_path)
+        result = get_sender(arguments)(message)
+        if arguments.outbox:
+            print('Wrote {0}'.format(result))
     except:
         print('An error occurred parsing the command-line arguments.')
         print(traceback.print_exc())
         exit(2)
 
 
-def get_message(from_address, recipients, subject, text, image):
+def parse_arguments(args=None):
+    """Return the email arguments parsed from the list of arguments, None is
+    the command line. Arguments that are not email arguments are ignored."""
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('-f', '--fromaddress',
+                        help='{0} [{1}]'.format(FROM, None))
+    parser.add_argument('-r', '--recipients',
+                        help='{0} [{1}]'.format(RECIPIENTS, None))
+    parser.add_argument('--subject',
+                        help='{0} [{1}]'.format(SUBJECT, None))
+    parser.add_argument('-i', '--image',
+                        help='{0} [{1}]'.format(IMAGE, None))
+    parser.add_argument('-s', '--server',
+                        help='{0} [{1}]'.format(SERVER, None))
+    parser.add_argument('--text',
+                        help='{0} [{1}]'.format(TEXT, None))
+    parser.add_argument('--text-file',
+                        help='{0} [{1}]'.format(TEXT_FILE, None))
+    parser.add_argument('-p', '--port', type=int,
+                        help='{0} [{1}]'.format(PORT, None))
+    parser.add_argument('-u', '--username',
+                        help='{0} [{1}]'.format(USERNAME, None))
+    parser.add_argument('--password',
+                        help='{0} [{1}]'.format(PASSWORD, None))
+    parser.add_argument('--outbox', action='store_true',
+                        help='{0} [{1}]'.format(OUTBOX, False))
+    arguments, extra = parser.parse_known_args(args)
+    return arguments
+
+
+def get_sender(arguments):
+    """Return a function that delivers a MIME message as the email arguments
+    say, putting it in the outbox or sending it to the SMTP server."""
+    if arguments.outbox:
+        # Import here because email_outbox imports this module.
+        import email_outbox
+        return email_outbox.Outbox().put
+    return functools.partial(send_tls_message, arguments.server,
+                             arguments.port, arguments.username,
+                             get_password(arguments))
+
+
+def get_password(arguments):
+    """Return the SMTP password of the email arguments, the SMTP_PASSWORD
+    environment variable or the password the user types."""
+    password = arguments.password
+    if not password:
+        password = os.getenv('SMTP_PASSWORD')
+        if not password:
+            password = getpass.getpass(PASSWORD + ': ')
+    return password
+
+
+def get_message(from_address, recipients, subject, text, image,
+                text_is_path=False):
     """Return a MIME message with both text and image parts.
     :param str from_address: The string email address to send from.
     :param list recipients: The comma separated addresses to send the email to.
     :param str subject: The string subject of the email message.
-    :param str text: The main path to the text file, or the text itself.
-    :param str image: The string path to a MIME supported image file."""
+    :param str text: The main text of the message, or the path to it.
+    :param str image: The string path to a MIME supported image file.
+    :param bool text_is_path: True when the text is the path to a file."""
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
     # Create a MIME multipart message of text and image.
     message = MIMEMultipart()
     message['Subject'] = subject
     message['From'] = from_address
     message['To'] = recipients
 
-    if os.path.isfile(text):
+    if text_is_path:
         with open(text, 'r') as reader:
             # Create a MIME text object from the contents of the file.
             content = MIMEText(reader.read(), 'html')
@@ -112,24 +155,84 @@ def get_message(from_address, recipients, subject, text, image):
     # Attach the MIMEText to the MIMEMultipart message.
     message.attach(content)
     if image and os.path.isfile(image):
-        # Read the image as binary date from the path.
-        with open(image, 'rb') as reader:
-            # Create a MIME image message object that contains the raw image.
-            mime_image = MIMEImage(reader.read())
-            # Attach the MIMEImage to the MIMEMultipart message.
-            message.attach(mime_image)
+        # Attach a MIME image part that reuses the encoded image.
+        message.attach(get_image_cache().get_part(image))
     return message
 
 
+def get_image_cache():
+    """Return the shared cache of encoded image parts."""
+    global _image_cache
+    if _image_cache is None:
+        _image_cache = ImagePartCache()
+    return _image_cache
+
+
+class ImagePartCache(object):
+    """The base64 encoded payloads of image files keyed by the path, modified
+    time and size of the file, so the same image attached to many messages
+    is read and encoded once. The least recently used payloads are removed
+    when the total size is over max_bytes."""
+
+    def __init__(self, max_bytes=IMAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_part(self, path):
+        """Return a new MIME image part of the image file at the path."""
+        from email.mime.base import MIMEBase
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is None:
+            entry = self.encode(path)
+            self.put(key, entry)
+        subtype, payload = entry
+        part = MIMEBase('image', subtype)
+        part.set_payload(payload)
+        part['Content-Transfer-Encoding'] = 'base64'
+        return part
+
+    def encode(self, path):
+        """Return the image subtype and base64 payload of the file."""
+        from email.mime.image import MIMEImage
+        with open(path, 'rb') as reader:
+            mime_image = MIMEImage(reader.read())
+        return mime_image.get_content_subtype(), mime_image.get_payload()
+
+    def put(self, key, entry):
+        """Add the entry and remove the least recently used entries until
+        the cache fits in max_bytes."""
+        with self._lock:
+            if key in self.entries:
+                return
+            self.entries[key] = entry
+            self.size += len(entry[1])
+            while self.size > self.max_bytes and self.entries:
+                _, (_, payload) = self.entries.popitem(last=False)
+                self.size -= len(payload)
+
+
 def interactive(text=None):
     """Prompt the user for the information and send an email message."""
     from_address = prompt(FROM)
     to = prompt(RECIPIENTS)
     subject = prompt(SUBJECT)
+    text_is_path = False
     if not text:
-        text = prompt(TEXT)
+        # Ask for a file first, an empty answer asks for the text itself.
+        text = prompt(TEXT_FILE)
+        text_is_path = bool(text)
+        if not text_is_path:
+            text = prompt(TEXT)
     image_path = prompt(IMAGE)
-    message = get_message(from_address, to, subject, text, image_path)
+    message = get_message(from_address, to, subject, text, image_path,
+                          text_is_path)
 
     server = prompt(SERVER, 'smtp.gmail.com')
     port = prompt(PORT, 587)
@@ -146,27 +249,153 @@ def prompt(text, default=None):
         return input('{0}: '.format(text))
 
 
+def connect_tls(server, port, username, password):
+    """Return a SMTP connection to a server on a port that has started TLS
+    and logged in with the username and password."""
+    import smtplib
+    email_server = smtplib.SMTP(server, port)
+    try:
+        email_server.ehlo()
+        email_server.starttls()
+        email_server.ehlo()
+        if username and password:
+            email_server.login(username, password)
+    except smtplib.SMTPAuthenticationError:
+        print('Unable to authenticate and send message.')
+        email_server.close()
+        raise
+    except:
+        email_server.close()
+        raise
+    return email_server
+
+
 def send_tls_message(server, port, username, password, message):
     """Connect to a server on a port, with a username and password to send a
     message."""
     try:
-        with smtplib.SMTP(server, port) as email_server:
-            email_server.ehlo()
-            email_server.starttls()
-            email_server.ehlo()
-            if username and password:
-                email_server.login(username, password)
+        with connect_tls(server, port, username, password) as email_server:
             # Send the MIME message.
             email_server.send_message(message)
             email_server.close()
-    except smtplib.SMTPAuthenticationError as sae:
-        print('Unable to authenticate and send message.')
-        raise
     except:
         print('Unable to send the message')
         raise
 
 
+class SMTPPool(object):
+    """A pool of open TLS connections to a SMTP server that are logged in,
+    to send many messages without a new handshake for each message."""
+
+    def __init__(self, server, port, username, password, size=POOL_SIZE,
+                 idle_timeout=IDLE_TIMEOUT):
+        """Create an empty pool, connections are opened when needed.
+        :param str server: The SMTP server to connect with.
+        :param int port: The port to use when connecting to the server.
+        :param str username: The username to authenticate with.
+        :param str password: The password on the SMTP server.
+        :param int size: The maximum number of open connections.
+        :param float idle_timeout: The seconds before an unused connection
+        is closed instead of reused."""
+        self.server = server
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self._idle = []  # A list of (last used time, connection) tuples.
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def acquire(self):
+        """Return an idle connection or a new one when none are idle, waiting
+        if size connections are already in use."""
+        self._slots.acquire()
+        try:
+            while True:
+                with self._lock:
+                    if not self._idle:
+                        break
+                    last_used, connection = self._idle.pop()
+                if time.monotonic() - last_used < self.idle_timeout:
+                    return connection
+                quit_connection(connection)
+            return connect_tls(self.server, self.port, self.username,
+                               self.password)
+        except:
+            self._slots.release()
+            raise
+
+    def release(self, connection):
+        """Return a connection to the pool, or close it when it is None."""
+        if connection is not None:
+            with self._lock:
+                self._idle.append((time.monotonic(), connection))
+        self._slots.release()
+
+    def send(self, message):
+        """Send a message on a pooled connection and return the dict of
+        refused recipients. Reconnect once if the server disconnected."""
+        import smtplib
+        connection = self.acquire()
+        try:
+            try:
+                refused = connection.send_message(message)
+            except smtplib.SMTPServerDisconnected:
+                quit_connection(connection)
+                connection = None
+                connection = connect_tls(self.server, self.port,
+                                         self.username, self.password)
+                refused = connection.send_message(message)
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+            # The server refused the message but the connection is usable.
+            raise
+        except:
+            # Do not return a broken connection to the pool.
+            if connection is not None:
+                quit_connection(connection)
+            connection = None
+            raise
+        finally:
+            self.release(connection)
+        return refused
+
+    def send_messages(self, messages):
+        """Send the messages over the pooled connections and return a list of
+        (message, result) tuples in the same order, where the result is the
+        dict of refused recipients or the exception that was raised."""
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor(self.size) as executor:
+            futures = [executor.submit(self.send, message)
+                       for message in messages]
+            results = []
+            for message, future in zip(messages, futures):
+                error = future.exception()
+                results.append((message, error or future.result()))
+        return results
+
+    def close(self):
+        """Close all the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for last_used, connection in idle:
+            quit_connection(connection)
+
+
+def quit_connection(connection):
+    """Quit a SMTP connection ignoring errors from a server that is gone."""
+    try:
+        connection.quit()
+    except OSError:
+        connection.close()
+
+
 if __name__ == '__main__':
     if len(sys.argv) > 1:
         command_line()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+"""
+event_pipeline is Python code to schedule events in this process, passing
+the result of each stage directly to the next stage.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import weather_metrics
+import weather_scheduler
+
+
+class EventPipeline(object):
+    """The fetch, context, render, message and deliver stages of an event.
+    A pipeline keeps no state of the events it runs, so one pipeline can
+    run many events, from several threads, without parsing arguments."""
+
+    def __init__(self, key=None, client=None, cache=None, offline=False,
+                 changes=None, send=None):
+        """Create a pipeline with the settings shared by the events.
+        :param str key: The weather underground key.
+        :param WeatherClient client: The client to request the weather with,
+        None is the shared client.
+        :param ForecastCache cache: The cache of the weather, None is the
+        shared cache.
+        :param bool offline: Use the cached weather data even if stale.
+        :param ChangeDetector changes: Skip the events that have not changed
+        since they were last delivered, None runs every event.
+        :param callable send: The function to deliver a MIME message with,
+        such as Outbox.put or SMTPPool.send."""
+        self.key = key
+        self.client = client
+        self.cache = cache
+        self.offline = offline
+        self.changes = changes
+        self.send = send
+
+    def fetch(self, location, target):
+        """Return the astronomy and hourly10day data of the location up to
+        the target datetime."""
+        return weather_scheduler.get_weather(self.key, location, target,
+                                             self.client, self.cache,
+                                             self.offline, until=target)
+
+    def context(self, context, target, location, weather):
+        """Return a copy of the context updated with the (astronomy,
+        hourly10day) weather data for the target datetime."""
+        astronomy_data, hourly10day_data = weather
+        return weather_scheduler.get_event_context(
+            dict(context), target, location, astronomy_data, hourly10day_data)
+
+    def is_changed(self, day, location, context):
+        """Return True when the event has changed since it was last saved."""
+        if self.changes is None:
+            return True
+        digest = self.changes.get_digest(context,
+                                         weather_scheduler.get_template(day))
+        return self.changes.is_changed(day, location, digest)
+
+    def remember(self, day, location, context):
+        """Stage the digest of the event to be saved, once the event was
+        delivered, so a failed event is not skipped the next time."""
+        if self.changes is not None:
+            digest = self.changes.get_digest(
+                context, weather_scheduler.get_template(day))
+            self.changes.update(day, location, digest)
+
+    def render(self, day, context, path=None):
+        """Return the text of the event, or when the path is given write the
+        event to the file as the template generates it and return the path
+        without keeping the text in memory."""
+        template = weather_scheduler.get_template(day)
+        with weather_metrics.METRICS.time('render'):
+            if path is None:
+                return template.render(context)
+            with open(path, 'w') as writer:
+                writer.writelines(template.generate(context))
+        return path
+
+    def message(self, event, email, is_path=False):
+        """Return the MIME message of the event text, or of the file when
+        is_path is True, with the fromaddress, recipients, subject and image
+        keys of the email dict."""
+        # Import here so events that are not sent do not load email.
+        import email_utilities
+        with weather_metrics.METRICS.time('mime'):
+            return email_utilities.get_message(email.get('fromaddress'),
+                                               email.get('recipients'),
+                                               email.get('subject'),
+                                               event,
+                                               email.get('image'),
+                                               is_path)
+
+    def deliver(self, message):
+        """Deliver the MIME message with the send function and return the
+        result of it."""
+        if self.send is None:
+            raise ValueError('The pipeline has no way to deliver messages.')
+        with weather_metrics.METRICS.time('deliver'):
+            return self.send(message)
+
+    def run(self, context, day, location, time, now=None, path=None,
+            email=None):
+        """Run every stage for the event on the next day after now at the
+        time, and return the text of the event or the path it was written
+        to. Return None when the event has not changed.
+        :param dict context: The context to render the template with.
+        :param str day: The day of the week of the event.
+        :param str location: The location of the weather.
+        :param time time: The time of day of the event.
+        :param datetime now: The time to find the next day after.
+        :param str path: The file to write the event to instead of
+        returning the text.
+        :param dict email: The fromaddress, recipients, subject and image of
+        the message to deliver, None does not deliver the event."""
+        target = weather_scheduler.get_datetime(day, time, now)
+        weather = self.fetch(location, target)
+        context = self.context(context, target, location, weather)
+        if not self.is_changed(day, location, context):
+            return None
+        event = self.render(day, context, path)
+        if email:
+            self.deliver(self.message(event, email, path is not None))
+        if self.changes is not None:
+            # Remember the event only after it was written and delivered.
+            self.remember(day, location, context)
+            self.changes.save()
+        return event
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+"""
+forecast_archive is Python code to append every fetched hourly forecast to
+fixed width binary records that are read back with mmap.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import bisect
+import datetime
+import mmap
+import os
+import struct
+import threading
+import time
+
+import forecast_table
+
+from array import array
+from urllib.parse import quote
+
+
+DESCRIPTION = 'Print what each archived forecast predicted for an hour.'
+DIRECTORY = os.getenv('WEATHER_ARCHIVE',
+                      os.path.join(os.path.expanduser('~'), '.cache',
+                                   'weather_scheduler', 'archive'))
+DIRECTORY_HELP = 'The directory of the forecast archive files'
+# The file header is the magic bytes, the version and the record size.
+HEADER = struct.Struct('<4sHH')
+# Each snapshot in the index is the issued epoch seconds, the number of the
+# first record and the number of records.
+INDEX = struct.Struct('<qQI')
+LOCATION = 'The location to print the archived forecasts of'
+MAGIC = b'WXA1'
+# Each record is the forecast hour as forecast_table.get_ordinal(), the
+# issued epoch seconds and the forecast_table.COLUMNS in order.
+RECORD = struct.Struct('<qq' + ''.join(code for _, _, _, code
+                                       in forecast_table.COLUMNS))
+TIME = 'The hour to print the forecasts of in "YYYY-MM-DD HH:MM" format'
+VERSION = 1
+
+
+def command_line():
+    """Parse the arguments from the command line and print every forecast
+    archived for the location and hour."""
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('-d', '--directory', default=DIRECTORY,
+                        help='{0} [{1}]'.format(DIRECTORY_HELP, DIRECTORY))
+    parser.add_argument('-l', '--location', default='MN/Rochester',
+                        help='{0} [{1}]'.format(LOCATION, 'MN/Rochester'))
+    parser.add_argument('-t', '--time', required=True,
+                        help='{0} [{1}]'.format(TIME, None))
+    arguments = parser.parse_args()
+    target = datetime.datetime.strptime(arguments.time, '%Y-%m-%d %H:%M')
+    archive = ForecastArchive(arguments.directory)
+    with archive.open(arguments.location) as reader:
+        for record in reader.forecasts(target):
+            print('{0:%Y-%m-%d %H:%M} {1:>4} F {2:>3}% {3:>4} mph {4} '
+                  '{5}'.format(record['issued'], record['temp_english'],
+                               record['pop'], record['wspd_english'],
+                               record['wdir_dir'], record['condition']))
+
+
+def from_ordinal(ordinal):
+    """Return the datetime of an hour from forecast_table.get_ordinal()."""
+    days, hour = divmod(ordinal, 24)
+    return datetime.datetime.combine(datetime.date.fromordinal(days),
+                                     datetime.time(hour))
+
+
+class ForecastArchive(object):
+    """A directory of append only forecast files per location. Each location
+    has a file of fixed width records, a file of the strings the records
+    point to and an index of the snapshots in the order they were issued.
+    There should be one process appending to the archive at a time."""
+
+    def __init__(self, directory=DIRECTORY):
+        """Create the archive directory if it does not exist."""
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_path(self, location, extension):
+        """Return the path of the archive file for the location."""
+        name = '{0}.{1}'.format(quote(location, safe=''), extension)
+        return os.path.join(self.directory, name)
+
+    def append(self, location, table, issued=None):
+        """Append the rows of the ForecastTable as a snapshot issued at the
+        epoch seconds, or now, and return the number of records written."""
+        if issued is None:
+            issued = time.time()
+        issued = int(issued)
+        with self._lock:
+            strings = read_strings(self.get_path(location, 'strings'))
+            codes = {value: code for code, value in enumerate(strings)}
+            added = []
+            # Map the string codes of the table to the codes of the archive.
+            mapping = []
+            for value in table.strings:
+                if value not in codes:
+                    codes[value] = len(strings) + len(added)
+                    added.append(value)
+                mapping.append(codes[value])
+
+            columns = [(table.column(name), code == 'H')
+                       for name, _, _, code in forecast_table.COLUMNS]
+            data = bytearray()
+            for index, hour in enumerate(table.hours):
+                values = [column[index] if not is_string
+                          else mapping[column[index]]
+                          for column, is_string in columns]
+                data += RECORD.pack(hour, issued, *values)
+
+            if added:
+                with open(self.get_path(location, 'strings'), 'a') as writer:
+                    writer.write(''.join(value + '\n' for value in added))
+            path = self.get_path(location, 'records')
+            with open(path, 'ab') as writer:
+                if writer.tell() == 0:
+                    writer.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+                first = (writer.tell() - HEADER.size) // RECORD.size
+                writer.write(data)
+            with open(self.get_path(location, 'index'), 'ab') as writer:
+                writer.write(INDEX.pack(issued, first, len(table)))
+        return len(table)
+
+    def open(self, location):
+        """Return an ArchiveReader of the records for the location."""
+        return ArchiveReader(self.get_path(location, 'records'),
+                             self.get_path(location, 'strings'),
+                             self.get_path(location, 'index'))
+
+
+class ArchiveReader(object):
+    """The records of one location mapped into memory, the records are only
+    decoded when they are read."""
+
+    def __init__(self, records_path, strings_path, index_path):
+        self.strings = read_strings(strings_path)
+        self.issued = array('q')
+        self.first = array('Q')
+        self.counts = array('I')
+        if os.path.isfile(index_path):
+            with open(index_path, 'rb') as reader:
+                for issued, first, count in INDEX.iter_unpack(reader.read()):
+                    self.issued.append(issued)
+                    self.first.append(first)
+                    self.counts.append(count)
+        self.map = None
+        self.length = 0
+        if os.path.isfile(records_path):
+            with open(records_path, 'rb') as reader:
+                self.map = mmap.mmap(reader.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+            magic, version, size = HEADER.unpack_from(self.map, 0)
+            if magic != MAGIC or size != RECORD.size:
+                self.close()
+                raise ValueError('{0} is not a version {1} forecast '
+                                 'archive.'.format(records_path, VERSION))
+            self.length = (len(self.map) - HEADER.size) // RECORD.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.length
+
+    def close(self):
+        """Unmap the records."""
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def get_hour(self, number):
+        """Return the forecast hour ordinal of the record number."""
+        return struct.unpack_from('<q', self.map,
+                                  HEADER.size + number * RECORD.size)[0]
+
+    def record(self, number):
+        """Return a dict of the hour and issued datetimes and the column
+        values of the record number."""
+        values = RECORD.unpack_from(self.map,
+                                    HEADER.size + number * RECORD.size)
+        record = {'hour': from_ordinal(values[0]),
+                  'issued': datetime.datetime.fromtimestamp(values[1])}
+        for (name, _, _, code), value in zip(forecast_table.COLUMNS,
+                                             values[2:]):
+            if code == 'H':
+                value = self.strings[value]
+            record[name] = value
+        return record
+
+    def snapshots(self, start=None, end=None):
+        """Return the indexes of the snapshots issued from the start datetime
+        up to the end datetime."""
+        first = 0
+        last = len(self.issued)
+        if start is not None:
+            first = bisect.bisect_left(self.issued, start.timestamp())
+        if end is not None:
+            last = bisect.bisect_left(self.issued, end.timestamp())
+        return range(first, last)
+
+    def find(self, snapshot, target):
+        """Return the record number of the target datetime in the snapshot,
+        or None when the snapshot does not forecast that hour."""
+        ordinal = forecast_table.get_ordinal(target)
+        low = self.first[snapshot]
+        high = low + self.counts[snapshot]
+        # The records of a snapshot are sorted by hour.
+        while low < high:
+            middle = (low + high) // 2
+            if self.get_hour(middle) < ordinal:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.first[snapshot] + self.counts[snapshot] and \
+                self.get_hour(low) == ordinal:
+            return low
+        return None
+
+    def forecasts(self, target, start=None, end=None):
+        """Return the records of every snapshot, issued from start up to end,
+        that forecast the hour of the target datetime, oldest first."""
+        records = []
+        for snapshot in self.snapshots(start, end):
+            number = self.find(snapshot, target)
+            if number is not None:
+                records.append(self.record(number))
+        return records
+
+
+def read_strings(path):
+    """Return the list of strings in the strings file, one per line."""
+    try:
+        with open(path, 'r') as reader:
+            return reader.read().split('\n')[:-1]
+    except FileNotFoundError:
+        return []
+
+
+if __name__ == '__main__':
+    command_line()
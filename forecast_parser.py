@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+"""
+forecast_parser is Python code to incrementally parse hourly forecast data.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import datetime
+import json
+
+
+CHUNK_SIZE = 16 * 1024  # The number of characters to parse at a time.
+# Parsing record by record is slower per record than json.loads, so it is
+# only used when the until hour is this close to the first record.
+EARLY_STOP_HOURS = 120
+# The FCTTIME keys that update_context uses.
+FCTTIME_FIELDS = ('year', 'mon', 'mday', 'hour', 'pretty')
+# The record keys that update_context uses.
+FIELDS = ('condition', 'dewpoint', 'feelslike', 'heatindex', 'humidity',
+          'mslp', 'pop', 'qpf', 'sky', 'snow', 'temp', 'uvi', 'wdir',
+          'windchill', 'wspd', 'wx')
+KEY = '"hourly_forecast"'
+WHITESPACE = ' \t\n\r,'
+
+_decoder = json.JSONDecoder()
+
+
+def get_hour(forecast_time):
+    """Return the datetime of the hour in a FCTTIME dictionary."""
+    return datetime.datetime(int(forecast_time['year']),
+                             int(forecast_time['mon']),
+                             int(forecast_time['mday']),
+                             int(forecast_time['hour']))
+
+
+def iter_text(text, size=CHUNK_SIZE):
+    """Yield the text in chunks of size characters."""
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def iter_records(chunks):
+    """Yield each record of the hourly_forecast array from an iterable of
+    text chunks, only holding one record of text in memory at a time."""
+    chunks = iter(chunks)
+    buffer = ''
+    # Read until the start of the hourly_forecast array.
+    while True:
+        index = buffer.find(KEY)
+        if index >= 0:
+            start = buffer.find('[', index + len(KEY))
+            if start >= 0:
+                buffer = buffer[start + 1:]
+                break
+        else:
+            # Keep enough text to match a key split across chunks.
+            buffer = buffer[-len(KEY):]
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError('The data does not contain hourly_forecast!')
+        buffer += chunk
+
+    position = 0
+    while True:
+        # Skip the whitespace and commas between the records.
+        while position < len(buffer) and buffer[position] in WHITESPACE:
+            position += 1
+        if position < len(buffer):
+            if buffer[position] == ']':
+                return
+            try:
+                record, position = _decoder.raw_decode(buffer, position)
+                yield record
+                continue
+            except json.JSONDecodeError:
+                # The record is incomplete, read more text below.
+                pass
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError('The hourly_forecast array is truncated!')
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def project_record(record):
+    """Return a record with only the keys that update_context uses."""
+    projected = {}
+    for field in FIELDS:
+        projected[field] = record.get(field)
+    forecast_time = record['FCTTIME']
+    projected['FCTTIME'] = {key: forecast_time[key] for key in FCTTIME_FIELDS}
+    return projected
+
+
+def get_first_hour(text):
+    """Return the datetime of the first hourly_forecast record in the text,
+    decoding only the FCTTIME of it, or None when it is not found."""
+    index = text.find(KEY)
+    if index >= 0:
+        index = text.find('"FCTTIME"', index)
+    if index >= 0:
+        index = text.find('{', index)
+    if index < 0:
+        return None
+    try:
+        forecast_time, _ = _decoder.raw_decode(text, index)
+        return get_hour(forecast_time)
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def decode_hourly10day(text, until=None):
+    """Return the hourly10day data with projected records from the text,
+    parsing it record by record only when stopping at the until hour skips
+    enough of the text to be faster than decoding all of it."""
+    if until is not None:
+        first = get_first_hour(text)
+        if first is not None and \
+                (until - first).total_seconds() / 3600 <= EARLY_STOP_HOURS:
+            return parse_records(iter_records(iter_text(text)), until)
+    data = json.loads(text)
+    if 'hourly_forecast' not in data:
+        raise ValueError('The data does not contain hourly_forecast!')
+    return parse_records(data['hourly_forecast'], until)
+
+
+def parse_hourly10day(chunks, until=None):
+    """Return the hourly10day data with projected records from an iterable of
+    text chunks. When until is a datetime stop reading after the record for
+    that hour."""
+    return parse_records(iter_records(chunks), until)
+
+
+def parse_records(records, until=None):
+    """Return the hourly10day data of the projected records. When until is a
+    datetime stop after the record for that hour."""
+    if until is not None:
+        until = until.replace(minute=0, second=0, microsecond=0)
+    forecasts = []
+    for record in records:
+        forecast = project_record(record)
+        forecasts.append(forecast)
+        if until is not None and get_hour(forecast['FCTTIME']) >= until:
+            break
+    return {'hourly_forecast': forecasts}
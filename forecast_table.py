@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+
+"""
+forecast_table is Python code to store hourly forecast data in columns.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import bisect
+import datetime
+import sys
+
+import forecast_parser
+
+from array import array
+
+
+MISSING = -9999  # The value Weather Underground uses for no data.
+# The column name, record key, record subkey and array type code of each
+# column. Type code 'h' is a signed short, 'd' is a double and 'H' is an
+# index into the table of interned strings.
+COLUMNS = (('condition', 'condition', None, 'H'),
+           ('dewpoint_english', 'dewpoint', 'english', 'h'),
+           ('dewpoint_metric', 'dewpoint', 'metric', 'h'),
+           ('feelslike_english', 'feelslike', 'english', 'h'),
+           ('feelslike_metric', 'feelslike', 'metric', 'h'),
+           ('heatindex_english', 'heatindex', 'english', 'h'),
+           ('heatindex_metric', 'heatindex', 'metric', 'h'),
+           ('humidity', 'humidity', None, 'h'),
+           ('mslp_english', 'mslp', 'english', 'd'),
+           ('mslp_metric', 'mslp', 'metric', 'h'),
+           ('pop', 'pop', None, 'h'),
+           ('qpf_english', 'qpf', 'english', 'd'),
+           ('qpf_metric', 'qpf', 'metric', 'h'),
+           ('sky', 'sky', None, 'h'),
+           ('snow_english', 'snow', 'english', 'd'),
+           ('snow_metric', 'snow', 'metric', 'h'),
+           ('temp_english', 'temp', 'english', 'h'),
+           ('temp_metric', 'temp', 'metric', 'h'),
+           ('uvi', 'uvi', None, 'h'),
+           ('wdir_degrees', 'wdir', 'degrees', 'h'),
+           ('wdir_dir', 'wdir', 'dir', 'H'),
+           ('windchill_english', 'windchill', 'english', 'h'),
+           ('windchill_metric', 'windchill', 'metric', 'h'),
+           ('wspd_english', 'wspd', 'english', 'h'),
+           ('wspd_metric', 'wspd', 'metric', 'h'),
+           ('wx', 'wx', None, 'H'))
+KEYS = {name: (key, subkey) for name, key, subkey, code in COLUMNS}
+TYPES = {name: code for name, key, subkey, code in COLUMNS}
+
+
+def find_row(hourly10day_data, target):
+    """Return a ForecastRecord of the hourly10day data for the hour of the
+    target datetime, or None. The records are scanned until the hour, which
+    is faster than building a ForecastTable to look up only one hour."""
+    ordinal = get_ordinal(target)
+    for forecast in hourly10day_data['hourly_forecast']:
+        hour = forecast_parser.get_hour(forecast['FCTTIME'])
+        if get_ordinal(hour) == ordinal:
+            return ForecastRecord(forecast)
+    return None
+
+
+def get_ordinal(target):
+    """Return the number of hours since the start of the proleptic Gregorian
+    calendar for the date and hour of the target datetime."""
+    return target.toordinal() * 24 + target.hour
+
+
+def parse_number(text, code):
+    """Return the number in the text for the array type code, or MISSING."""
+    try:
+        if code == 'd':
+            return float(text)
+        return int(text)
+    except (TypeError, ValueError):
+        return MISSING
+
+
+class ForecastTable(object):
+    """The hourly_forecast records of the hourly10day data stored as one
+    typed array per column, sorted by the hour they forecast."""
+
+    def __init__(self, hourly10day_data):
+        """Copy the values used by update_context out of the records."""
+        records = []
+        for forecast in hourly10day_data['hourly_forecast']:
+            hour = forecast_parser.get_hour(forecast['FCTTIME'])
+            records.append((get_ordinal(hour), forecast))
+        records.sort(key=lambda record: record[0])
+
+        self.hours = array('q', [ordinal for ordinal, _ in records])
+        # The pretty time is unique per row so it is kept as a list.
+        self.pretty = [forecast['FCTTIME']['pretty']
+                       for _, forecast in records]
+        self.strings = []
+        codes = {}
+        self.columns = {}
+        # The text of the float columns, str() of a float is not the text.
+        self.texts = {}
+        for name, key, subkey, code in COLUMNS:
+            column = array(code)
+            if code == 'd':
+                self.texts[name] = [get_text(forecast, key, subkey)
+                                    for _, forecast in records]
+            for _, forecast in records:
+                value = forecast.get(key)
+                if subkey and value is not None:
+                    value = value.get(subkey)
+                if code == 'H':
+                    value = sys.intern(value or '')
+                    if value not in codes:
+                        codes[value] = len(self.strings)
+                        self.strings.append(value)
+                    column.append(codes[value])
+                else:
+                    column.append(parse_number(value, code))
+            self.columns[name] = column
+
+    def __len__(self):
+        return len(self.hours)
+
+    def column(self, name):
+        """Return the array of values for the named column, string columns
+        are indexes into the strings list."""
+        return self.columns[name]
+
+    def get(self, target):
+        """Return the row for the hour of the target datetime, or None."""
+        ordinal = get_ordinal(target)
+        index = bisect.bisect_left(self.hours, ordinal)
+        if index < len(self.hours) and self.hours[index] == ordinal:
+            return ForecastRow(self, index)
+        return None
+
+    def between(self, start, end):
+        """Return the rows from the start datetime up to the end."""
+        first = bisect.bisect_left(self.hours, get_ordinal(start))
+        last = bisect.bisect_left(self.hours, get_ordinal(end))
+        return [ForecastRow(self, index) for index in range(first, last)]
+
+    def where(self, name, low, high):
+        """Return the indexes of the rows where the named numeric column is
+        between low and high inclusive."""
+        column = self.columns[name]
+        return [index for index, value in enumerate(column)
+                if low <= value <= high]
+
+    def value(self, name, index):
+        """Return the value of the named column in the row at index."""
+        value = self.columns[name][index]
+        if TYPES[name] == 'H':
+            return self.strings[value]
+        return value
+
+
+class ForecastRow(object):
+    """A view of one row of a ForecastTable, the columns are attributes."""
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def __getattr__(self, name):
+        if name not in TYPES:
+            raise AttributeError(name)
+        return self.table.value(name, self.index)
+
+    def __getitem__(self, name):
+        return self.__getattr__(name)
+
+    @property
+    def hour(self):
+        """The datetime of the hour this row forecasts."""
+        days, hour = divmod(self.table.hours[self.index], 24)
+        return datetime.datetime.combine(datetime.date.fromordinal(days),
+                                         datetime.time(hour))
+
+    @property
+    def pretty(self):
+        """The human readable time of the forecast."""
+        return self.table.pretty[self.index]
+
+    def text(self, name):
+        """Return the value of the named column as a string, in the format
+        of the original Weather Underground data."""
+        if name in self.table.texts:
+            return self.table.texts[name][self.index]
+        return str(self.__getattr__(name))
+
+
+class ForecastRecord(object):
+    """A view of one hourly_forecast record with the interface of a
+    ForecastRow, for a record that is not in a ForecastTable."""
+    __slots__ = ('record',)
+
+    def __init__(self, record):
+        self.record = record
+
+    def __getattr__(self, name):
+        if name not in TYPES:
+            raise AttributeError(name)
+        key, subkey = KEYS[name]
+        value = self.record.get(key)
+        if subkey and value is not None:
+            value = value.get(subkey)
+        if TYPES[name] == 'H':
+            return value or ''
+        return parse_number(value, TYPES[name])
+
+    def __getitem__(self, name):
+        return self.__getattr__(name)
+
+    @property
+    def hour(self):
+        """The datetime of the hour this record forecasts."""
+        return forecast_parser.get_hour(self.record['FCTTIME'])
+
+    @property
+    def pretty(self):
+        """The human readable time of the forecast."""
+        return self.record['FCTTIME']['pretty']
+
+    def text(self, name):
+        """Return the value of the named column as the original string."""
+        return get_text(self.record, *KEYS[name])
+
+
+def get_text(forecast, key, subkey):
+    """Return the text of the key and subkey of a record, the empty string
+    when the record does not have them."""
+    value = forecast.get(key)
+    if subkey and value is not None:
+        value = value.get(subkey)
+    if value is None:
+        return ''
+    return str(value)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+
+"""
+replay_server is Python code to serve the recorded weather data in the
+examples directory like the Weather Underground API, with added latency,
+limited bandwidth, errors and truncated responses.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import email.utils
+import glob
+import gzip
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler
+from http.server import HTTPServer
+from socketserver import ThreadingMixIn
+
+
+BANDWIDTH = 'The bytes per second to send each response at, 0 is unlimited'
+CHUNK_SIZE = 8 * 1024  # The bytes to write between bandwidth pauses.
+DESCRIPTION = 'Serve the recorded weather data like the weather API.'
+ERROR_RATE = 'The fraction of requests to answer with a 500 error'
+EXAMPLES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'examples')
+EXAMPLES_HELP = 'The directory of the recorded <date>-<feature>.json files'
+HOST = 'The address to listen on'
+JITTER = 'The most random seconds to add to the latency'
+LATENCY = 'The seconds to wait before each response'
+PATH = re.compile(r'^/api/(?P<key>[^/]+)/(?P<feature>[^/]+)/q/'
+                  r'(?P<location>.+)\.json$')
+PORT = 'The port to listen on'
+SEED = 'The seed of the random faults, to repeat a run'
+TRUNCATE_RATE = 'The fraction of responses to cut off half way through'
+
+
+def command_line():
+    """Parse the arguments from the command line and serve until
+    interrupted."""
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('-b', '--bandwidth', type=int, default=0,
+                        help='{0} [{1}]'.format(BANDWIDTH, 0))
+    parser.add_argument('-e', '--error-rate', type=float, default=0.0,
+                        help='{0} [{1}]'.format(ERROR_RATE, 0.0))
+    parser.add_argument('--examples', default=EXAMPLES,
+                        help='{0} [{1}]'.format(EXAMPLES_HELP, EXAMPLES))
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='{0} [{1}]'.format(HOST, '127.0.0.1'))
+    parser.add_argument('-j', '--jitter', type=float, default=0.0,
+                        help='{0} [{1}]'.format(JITTER, 0.0))
+    parser.add_argument('-l', '--latency', type=float, default=0.0,
+                        help='{0} [{1}]'.format(LATENCY, 0.0))
+    parser.add_argument('-p', '--port', type=int, default=8080,
+                        help='{0} [{1}]'.format(PORT, 8080))
+    parser.add_argument('--seed', type=int,
+                        help='{0} [{1}]'.format(SEED, None))
+    parser.add_argument('-t', '--truncate-rate', type=float, default=0.0,
+                        help='{0} [{1}]'.format(TRUNCATE_RATE, 0.0))
+    arguments = parser.parse_args()
+
+    server = ReplayServer((arguments.host, arguments.port),
+                          examples=arguments.examples,
+                          latency=arguments.latency,
+                          jitter=arguments.jitter,
+                          bandwidth=arguments.bandwidth,
+                          error_rate=arguments.error_rate,
+                          truncate_rate=arguments.truncate_rate,
+                          seed=arguments.seed)
+    print('Serving {0} on http://{1}:{2}'.format(arguments.examples,
+                                                 *server.server_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def read_examples(directory):
+    """Return a dict of feature name to the bytes of the newest recorded
+    response for that feature in the directory."""
+    bodies = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*-*.json'))):
+        # The names are <year>-<month>-<day>-<feature>.json so the newest
+        # date of each feature sorts last.
+        feature = os.path.basename(path)[11:-5]
+        with open(path, 'rb') as reader:
+            bodies[feature] = reader.read()
+    return bodies
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    """Answer the API requests with the recorded responses and the faults
+    configured on the server."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        server.count('requests')
+        match = PATH.match(self.path.split('?', 1)[0])
+        body = None
+        if match:
+            body = server.bodies.get(match.group('feature'))
+        delay = server.latency
+        if server.jitter:
+            delay += server.random(server.jitter)
+        if delay:
+            time.sleep(delay)
+        if body is None:
+            self.send_body(404, b'{"error": "not found"}')
+            return
+        if server.random() < server.error_rate:
+            server.count('errors')
+            self.send_body(500, b'{"error": "injected"}')
+            return
+        feature = match.group('feature')
+        headers = {'ETag': server.etags[feature],
+                   'Last-Modified': server.last_modified}
+        if self.is_not_modified(headers):
+            server.count('not_modified')
+            self.send_body(304, b'', headers=headers)
+            return
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = server.compressed[feature]
+            headers['Content-Encoding'] = 'gzip'
+        if server.random() < server.truncate_rate:
+            # Promise the whole body but close the connection half way.
+            server.count('truncated')
+            self.send_body(200, body, len(body) // 2, headers)
+            self.close_connection = True
+        else:
+            self.send_body(200, body, headers=headers)
+
+    def is_not_modified(self, headers):
+        """Return True when the conditional request headers match the
+        validators of the current response."""
+        etag = self.headers.get('If-None-Match')
+        if etag is not None:
+            return etag == headers['ETag']
+        since = self.headers.get('If-Modified-Since')
+        return since is not None and since == headers['Last-Modified']
+
+    def send_body(self, status, body, length=None, headers=None):
+        """Send the status, headers and the first length bytes of the body at
+        the bandwidth of the server."""
+        if length is None:
+            length = len(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        for name, value in sorted((headers or {}).items()):
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.server.count('bytes_sent', length)
+        bandwidth = self.server.bandwidth
+        for start in range(0, length, CHUNK_SIZE):
+            chunk = body[start:min(start + CHUNK_SIZE, length)]
+            self.wfile.write(chunk)
+            if bandwidth:
+                time.sleep(len(chunk) / bandwidth)
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        if self.server.verbose:
+            super(ReplayHandler, self).log_message(*args)
+
+
+class ReplayServer(ThreadingMixIn, HTTPServer):
+    """A threaded HTTP server of the recorded weather API responses."""
+    daemon_threads = True
+
+    def __init__(self, address, examples=EXAMPLES, latency=0.0, jitter=0.0,
+                 bandwidth=0, error_rate=0.0, truncate_rate=0.0, seed=None,
+                 verbose=False):
+        """Read the examples and listen on the address.
+        :param tuple address: The host and port, port 0 picks a free port.
+        :param str examples: The directory of the recorded responses.
+        :param float latency: The seconds to wait before each response.
+        :param float jitter: The most random seconds to add to the latency.
+        :param int bandwidth: The bytes per second to send, 0 is unlimited.
+        :param float error_rate: The fraction of 500 responses.
+        :param float truncate_rate: The fraction of truncated responses.
+        :param int seed: The seed of the random faults.
+        :param bool verbose: Log each request to stderr."""
+        HTTPServer.__init__(self, address, ReplayHandler)
+        self.bodies = read_examples(examples)
+        self.compressed = {feature: gzip.compress(body)
+                           for feature, body in self.bodies.items()}
+        self.etags = {feature: '"{0}"'.format(
+                          hashlib.sha1(body).hexdigest()[:16])
+                      for feature, body in self.bodies.items()}
+        self.last_modified = email.utils.formatdate(usegmt=True)
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self.verbose = verbose
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    @property
+    def url(self):
+        """Return the base URL of this server for the weather client."""
+        return 'http://{0}:{1}'.format(*self.server_address[:2])
+
+    def count(self, counter, value=1):
+        """Add the value to a counter such as requests or errors."""
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def random(self, scale=1.0):
+        """Return a random number from zero to scale, safe across the
+        handler threads."""
+        with self._lock:
+            return self._random.random() * scale
+
+    def start(self):
+        """Serve on a daemon thread and return the thread."""
+        thread = threading.Thread(target=self.serve_forever, name='replay')
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    command_line()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+"""
+ride_windows is Python code to score every hour of the 10 day forecast for
+riding and find the best start times of each day in the forecast.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import argparse
+import datetime
+import heapq
+import os
+
+import forecast_table
+import solar_table
+import weather_scheduler
+
+from array import array
+
+
+DESCRIPTION = 'Print the best hours to start a ride on each day.'
+# The hours of daylight that count towards the score, a longer ride is not
+# better than this.
+DAYLIGHT_HOURS = 3
+IDEAL_TEMPERATURE = 68  # The feels like temperature in F with no penalty.
+# The hours of daylight left at the start time to be a candidate.
+MINIMUM_DAYLIGHT = 1
+TOP = 'The number of start times to print for each day'
+# The points of each penalty and the daylight bonus of the score, a perfect
+# hour with DAYLIGHT_HOURS of daylight left is 100 points.
+WEIGHTS = {'daylight': 10 / DAYLIGHT_HOURS,  # Per hour of daylight left.
+           'pop': 0.3,  # Per percent of probability of precipitation.
+           'qpf': 100,  # Per inch of quantitative precipitation.
+           'temperature': 1.5,  # Per degree F from IDEAL_TEMPERATURE.
+           'wind': 1.5}  # Per mph of wind speed.
+
+
+def command_line():
+    """Parse the arguments from the command line and print the best start
+    times of each day in the forecast."""
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('-k', '--key',
+                        help='{0} [{1}]'.format(weather_scheduler.KEY, None))
+    parser.add_argument('-l', '--location',
+                        default=weather_scheduler.DEFAULT_LOCATION,
+                        help='{0} [{1}]'.format(
+                            weather_scheduler.LOCATION,
+                            weather_scheduler.DEFAULT_LOCATION))
+    parser.add_argument('--offline', action='store_true',
+                        help='{0} [{1}]'.format(weather_scheduler.OFFLINE,
+                                                False))
+    parser.add_argument('--top', default=3, type=int,
+                        help='{0} [{1}]'.format(TOP, 3))
+    arguments = parser.parse_args()
+    key = arguments.key or os.getenv('KEY')
+    astronomy, hourly = weather_scheduler.get_weather(
+        key, arguments.location, datetime.date.today(),
+        offline=arguments.offline)
+    if not astronomy or not hourly:
+        # The errors getting the weather were already printed.
+        print('The weather for {0} is not available.'.format(
+            arguments.location))
+        exit(1)
+    windows = get_windows(astronomy, hourly, arguments.location,
+                          arguments.top)
+    for day in sorted(windows):
+        for score, target, context in windows[day]:
+            print('{0:<9} {1:%Y-%m-%d %I:%M %p} {2:>5.1f} {3:>3} F '
+                  '{4:>3} mph {5:<3} {6:>3}% {7:.1f} hours'.format(
+                      context['event_day'], target, score,
+                      context['temperature_english'],
+                      context['wind_speed_english'],
+                      context['wind_direction'],
+                      context['probability_of_precipitation'],
+                      context['daylight_in_hours']))
+
+
+def get_sun_hours(astronomy_data, day):
+    """Return the sunrise and sunset of the date as hours after midnight,
+    from a SunTable or the sun_phase of the astronomy API data."""
+    if isinstance(astronomy_data, solar_table.SunTable):
+        sunrise, sunset = astronomy_data.get(day)
+        if sunrise is None or sunset is None:
+            return 0.0, 0.0
+        midnight = datetime.datetime.combine(day, datetime.time())
+        return ((sunrise - midnight).total_seconds() / 3600,
+                (sunset - midnight).total_seconds() / 3600)
+    sun_phase = astronomy_data['sun_phase']
+    return tuple(int(sun_phase[name]['hour']) +
+                 int(sun_phase[name]['minute']) / 60
+                 for name in ('sunrise', 'sunset'))
+
+
+def get_daylight(table, astronomy_data):
+    """Return an array of the hours of daylight left at each row of the
+    table, zero before sunrise and after sunset."""
+    sun = {}
+    daylight = array('d')
+    for ordinal in table.hours:
+        days, hour = divmod(ordinal, 24)
+        if days not in sun:
+            sun[days] = get_sun_hours(astronomy_data,
+                                      datetime.date.fromordinal(days))
+        sunrise, sunset = sun[days]
+        if sunrise <= hour < sunset:
+            daylight.append(sunset - hour)
+        else:
+            daylight.append(0.0)
+    return daylight
+
+
+def score(table, daylight):
+    """Return an array of the ride score of each row of the table, computed
+    column by column. Rows without the temperature or wind speed score
+    None, as do rows with less than MINIMUM_DAYLIGHT left."""
+    missing = forecast_table.MISSING
+    # The windchill is only forecast when it is colder than the temperature.
+    feels = [chill if chill != missing else temperature
+             for temperature, chill in zip(
+                 table.column('temp_english'),
+                 table.column('windchill_english'))]
+    penalties = [WEIGHTS['temperature'] * abs(value - IDEAL_TEMPERATURE)
+                 for value in feels]
+    penalties = [penalty + WEIGHTS['wind'] * speed
+                 for penalty, speed in zip(penalties,
+                                           table.column('wspd_english'))]
+    penalties = [penalty + WEIGHTS['pop'] * max(pop, 0)
+                 for penalty, pop in zip(penalties, table.column('pop'))]
+    penalties = [penalty + WEIGHTS['qpf'] * max(qpf, 0)
+                 for penalty, qpf in zip(penalties,
+                                         table.column('qpf_english'))]
+    scores = [90 - penalty + WEIGHTS['daylight'] * min(left, DAYLIGHT_HOURS)
+              for penalty, left in zip(penalties, daylight)]
+    return [None if left < MINIMUM_DAYLIGHT or temperature == missing or
+            speed == missing else value
+            for value, left, temperature, speed in zip(
+                scores, daylight, table.column('temp_english'),
+                table.column('wspd_english'))]
+
+
+def get_windows(astronomy_data, hourly10day_data, location, top=3,
+                context=None):
+    """Return a dict of each date in the forecast to a list of the top
+    (score, datetime, context) start times of that date, best first. The
+    context is the event context of that start time, with the location and
+    the routes for the wind.
+    :param astronomy_data: A SunTable or the astronomy API data.
+    :param hourly10day_data: A ForecastTable or the hourly10day API data.
+    :param str location: The location of the weather.
+    :param int top: The number of start times to return for each date.
+    :param dict context: The context to copy for each start time."""
+    table = hourly10day_data
+    if not isinstance(table, forecast_table.ForecastTable):
+        table = forecast_table.ForecastTable(hourly10day_data)
+    scores = score(table, get_daylight(table, astronomy_data))
+    # The rows of each day, by the ordinal of the date.
+    days = {}
+    for index, (hour, value) in enumerate(zip(table.hours, scores)):
+        if value is not None:
+            days.setdefault(hour // 24, []).append(index)
+    windows = {}
+    for ordinal, indexes in days.items():
+        best = heapq.nlargest(top, indexes, key=lambda index: scores[index])
+        candidates = []
+        for index in best:
+            target = forecast_table.ForecastRow(table, index).hour
+            candidate = weather_scheduler.get_event_context(
+                dict(context or {}), target, location, astronomy_data, table)
+            candidate['ride_score'] = scores[index]
+            candidates.append((scores[index], target, candidate))
+        windows[datetime.date.fromordinal(ordinal)] = candidates
+    return windows
+
+
+if __name__ == '__main__':
+    command_line()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+"""
+route_catalog is Python code to look up the ride routes for a start point
+and wind direction.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import os
+
+
+IMAGE_URL = 'https://ridewithgps.com/routes/full/{0}.png'
+# The routes.json file next to this file.
+ROUTES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      'routes.json')
+ROUTE_URL = 'https://ridewithgps.com/routes/{0}'
+
+_catalog = None  # The shared catalog, created on the first get_catalog().
+
+
+class RouteCatalog(object):
+    """The routes of each start point indexed by the wind directions they
+    are ridden in. The catalog is a JSON object with a days object of the
+    day name to the start point of the ride that day, and a routes list of
+    objects with start, wind, miles, route and optional url and image
+    keys."""
+
+    def __init__(self, path=ROUTES):
+        """Read the catalog and index the routes."""
+        with open(path, 'r') as reader:
+            catalog = json.load(reader)
+        self.days = catalog.get('days', {})
+        self.index = {}
+        for route in catalog['routes']:
+            row = {'miles': route['miles'],
+                   'route': route['route'],
+                   'url': route.get('url') or
+                   ROUTE_URL.format(route['route']),
+                   'image': route.get('image') or
+                   IMAGE_URL.format(route['route'])}
+            for direction in route['wind']:
+                key = (route['start'], direction)
+                self.index.setdefault(key, []).append(row)
+        for rows in self.index.values():
+            rows.sort(key=lambda row: row['miles'])
+
+    def get_start(self, day):
+        """Return the start point of the ride on the day, or None."""
+        return self.days.get(day.lower())
+
+    def get_rows(self, start, wind_direction, max_miles=None):
+        """Return the route rows for the start point and wind direction,
+        shortest first, that are no longer than max_miles."""
+        rows = self.index.get((start, wind_direction), [])
+        if max_miles is not None:
+            rows = [row for row in rows if row['miles'] <= max_miles]
+        return rows
+
+
+def get_catalog():
+    """Return the shared catalog of the routes.json file."""
+    global _catalog
+    if _catalog is None:
+        _catalog = RouteCatalog()
+    return _catalog
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+"""
+single_flight is Python code to share one call between the threads that ask
+for the same thing at the same time.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import threading
+
+import weather_metrics
+
+
+class Call(object):
+    """One call in flight, the result or error is set when done."""
+
+    def __init__(self, key):
+        self.key = key
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def wait(self):
+        """Wait for the call to finish and return the result or raise the
+        error of the thread that made the call."""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight(object):
+    """The calls in flight by key. The first thread to ask for a key makes
+    the call and the others wait for its result. The key is forgotten when
+    the call finishes, so the result is only kept by the waiting threads and
+    the next call for the key starts a new flight."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = {}
+
+    def begin(self, key):
+        """Return the call in flight for the key and True when this thread
+        must make it, or False when it should wait for another thread."""
+        with self._lock:
+            call = self.calls.get(key)
+            if call is not None:
+                weather_metrics.METRICS.increment('coalesced')
+                return call, False
+            call = Call(key)
+            self.calls[key] = call
+            return call, True
+
+    def complete(self, call, function, *args, **kwargs):
+        """Make the call this thread began with the function and arguments,
+        share the result or error with the waiting threads and return it."""
+        try:
+            call.result = function(*args, **kwargs)
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                if self.calls.get(call.key) is call:
+                    del self.calls[call.key]
+            call.done.set()
+
+    def do(self, key, function, *args, **kwargs):
+        """Return the result of the function with the arguments, sharing the
+        call with any other thread doing the same key at the same time."""
+        call, leader = self.begin(key)
+        if leader:
+            return self.complete(call, function, *args, **kwargs)
+        return call.wait()
+
+
+FLIGHTS = SingleFlight()  # The calls in flight in this process.
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+
+"""
+solar_table is Python code to compute the sunrise and sunset of locations
+without requesting the astronomy data from the API.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import datetime
+import json
+import math
+import os
+import re
+import threading
+
+from array import array
+
+
+# The latitude, longitude and time zone of the locations the sun is computed
+# for, other locations use the astronomy API.
+LOCATIONS = {'MN/Rochester': (44.0121, -92.4802, 'America/Chicago')}
+# A JSON file of more locations in the same format as LOCATIONS.
+LOCATIONS_FILE = os.getenv('WEATHER_LOCATIONS')
+# A location query of the latitude and longitude, such as "44.01,-92.48".
+COORDINATES = re.compile(r'^\s*(-?\d+(?:\.\d*)?)\s*,\s*(-?\d+(?:\.\d*)?)\s*$')
+J2000 = 2451545.0  # The Julian date of noon on January 1, 2000.
+UNIX_EPOCH = 2440587.5  # The Julian date of January 1, 1970.
+
+_lock = threading.Lock()
+_locations = None  # The LOCATIONS and LOCATIONS_FILE, see get_coordinates().
+_tables = {}  # The SunTable of each location, see get_table().
+
+
+def compute(latitudes, longitudes, ordinals):
+    """Return arrays of the sunrise and sunset epoch seconds for each
+    latitude, longitude and proleptic Gregorian ordinal of the same index.
+    The values are NaN when the sun does not rise or set that day."""
+    radians = math.radians
+    sin = math.sin
+    # The days since J2000 of each mean solar noon, 730120 is the ordinal
+    # of January 1, 2000.
+    noons = [ordinal - 730120 + 0.0008 - longitude / 360
+             for ordinal, longitude in zip(ordinals, longitudes)]
+    anomalies = [radians((357.5291 + 0.98560028 * noon) % 360)
+                 for noon in noons]
+    centers = [1.9148 * sin(m) + 0.02 * sin(2 * m) + 0.0003 * sin(3 * m)
+               for m in anomalies]
+    ecliptic = [radians((math.degrees(m) + c + 282.9372) % 360)
+                for m, c in zip(anomalies, centers)]
+    transits = [J2000 + noon + 0.0053 * sin(m) - 0.0069 * sin(2 * e)
+                for noon, m, e in zip(noons, anomalies, ecliptic)]
+    declinations = [math.asin(sin(e) * sin(radians(23.4397)))
+                    for e in ecliptic]
+    # The sun is up when its center is 0.833 degrees below the horizon.
+    altitude = sin(radians(-0.833))
+    sunrises = array('d')
+    sunsets = array('d')
+    for latitude, transit, declination in zip(latitudes, transits,
+                                              declinations):
+        phi = radians(latitude)
+        cosine = (altitude - sin(phi) * sin(declination)) / \
+            (math.cos(phi) * math.cos(declination))
+        if -1 <= cosine <= 1:
+            half = math.degrees(math.acos(cosine)) / 360
+            sunrises.append((transit - half - UNIX_EPOCH) * 86400)
+            sunsets.append((transit + half - UNIX_EPOCH) * 86400)
+        else:
+            sunrises.append(math.nan)
+            sunsets.append(math.nan)
+    return sunrises, sunsets
+
+
+def get_coordinates(location):
+    """Return the latitude, longitude and time zone name of the location, or
+    None when the location is not known. Coordinate locations use the local
+    time zone."""
+    global _locations
+    with _lock:
+        if _locations is None:
+            _locations = dict(LOCATIONS)
+            if LOCATIONS_FILE:
+                with open(LOCATIONS_FILE, 'r') as reader:
+                    _locations.update(json.load(reader))
+    if location in _locations:
+        latitude, longitude, zone = _locations[location]
+        return float(latitude), float(longitude), zone
+    match = COORDINATES.match(location)
+    if match:
+        return float(match.group(1)), float(match.group(2)), None
+    return None
+
+
+def get_table(location):
+    """Return the shared SunTable of the location, or None when the location
+    is not known."""
+    with _lock:
+        table = _tables.get(location)
+    if table is None:
+        coordinates = get_coordinates(location)
+        if coordinates is None:
+            return None
+        with _lock:
+            table = _tables.setdefault(location, SunTable(*coordinates))
+    return table
+
+
+def get_ordinals(year):
+    """Return the range of the proleptic Gregorian ordinals of the year."""
+    return range(datetime.date(year, 1, 1).toordinal(),
+                 datetime.date(year + 1, 1, 1).toordinal())
+
+
+def get_tables(locations, year):
+    """Return a dict of location to SunTable for the known locations, with
+    the whole year computed for all of them in one call."""
+    tables = {}
+    for location in locations:
+        table = get_table(location)
+        if table is not None:
+            tables[location] = table
+    missing = [table for table in tables.values() if year not in table.years]
+    ordinals = get_ordinals(year)
+    days = len(ordinals)
+    latitudes = []
+    longitudes = []
+    for table in missing:
+        latitudes.extend([table.latitude] * days)
+        longitudes.extend([table.longitude] * days)
+    sunrises, sunsets = compute(latitudes, longitudes,
+                                list(ordinals) * len(missing))
+    for number, table in enumerate(missing):
+        start = number * days
+        table.add_year(year, sunrises[start:start + days],
+                       sunsets[start:start + days])
+    return tables
+
+
+class SunTable(object):
+    """The sunrise and sunset of each day at one location, stored as one
+    array of epoch seconds per year."""
+
+    def __init__(self, latitude, longitude, zone=None):
+        """Create an empty table, the years are computed when first used.
+        :param float latitude: The degrees north of the equator.
+        :param float longitude: The degrees east of Greenwich.
+        :param str zone: The IANA time zone name, None is the local time."""
+        self.latitude = latitude
+        self.longitude = longitude
+        self.zone = None
+        if zone:
+            try:
+                import zoneinfo
+                self.zone = zoneinfo.ZoneInfo(zone)
+            except (ImportError, KeyError, ValueError):
+                pass
+        # The year to the sunrise and sunset arrays of every day.
+        self.years = {}
+
+    def add_year(self, year, sunrises, sunsets):
+        """Store the arrays of sunrise and sunset epoch seconds of the year."""
+        self.years[year] = (sunrises, sunsets)
+
+    def get(self, day):
+        """Return the local sunrise and sunset datetimes of the date, either
+        is None when the sun does not rise or set that day."""
+        if day.year not in self.years:
+            ordinals = get_ordinals(day.year)
+            self.add_year(day.year, *compute(
+                [self.latitude] * len(ordinals),
+                [self.longitude] * len(ordinals), ordinals))
+        sunrises, sunsets = self.years[day.year]
+        index = day.toordinal() - datetime.date(day.year, 1, 1).toordinal()
+        return self.to_local(sunrises[index]), self.to_local(sunsets[index])
+
+    def to_local(self, seconds):
+        """Return the naive local datetime of the epoch seconds, or None."""
+        if math.isnan(seconds):
+            return None
+        if self.zone is None:
+            return datetime.datetime.fromtimestamp(seconds)
+        return datetime.datetime.fromtimestamp(seconds, self.zone) \
+            .replace(tzinfo=None)
+
+    def get_astronomy_data(self, day):
+        """Return the sun_phase of the date in the format of the astronomy
+        API data."""
+        sun_phase = {}
+        for name, value in zip(('sunrise', 'sunset'), self.get(day)):
+            if value is not None:
+                sun_phase[name] = {'hour': str(value.hour),
+                                   'minute': '{0:02d}'.format(value.minute)}
+        return {'sun_phase': sun_phase}
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import time
+import unittest
+import sys
+from os import path
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import email_outbox
+import email_utilities
+
+
+class TestEmailOutbox(unittest.TestCase):
+    """A unit test TestCase class to run tests on the email outbox."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.outbox = email_outbox.Outbox(self.directory.name, backoff=10,
+                                          max_attempts=3)
+        self.message = email_utilities.get_message('a@b.c', 'd@e.f',
+                                                   'Monday ride',
+                                                   '<p>Ride safe.</p>', None)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_drain(self):
+        """Make sure delivered messages are removed from the outbox."""
+        self.outbox.put(self.message)
+        sent = []
+        assert 1 == self.outbox.drain(sent.append)
+        assert 'Monday ride' == sent[0]['Subject']
+        assert 'Ride safe.' in sent[0].get_payload()[0].get_content()
+        assert ([], None) == self.outbox.get_due()
+
+    def test_backoff(self):
+        """Make sure failed messages wait longer after each attempt and move
+        to the failed directory after max_attempts."""
+        def fail(message):
+            raise ConnectionRefusedError('The server is down.')
+        self.outbox.put(self.message)
+        now = time.time()
+        assert 0 == self.outbox.drain(fail)
+        due, next_due = self.outbox.get_due()
+        assert [] == due
+        assert now + 9 < next_due < now + 11
+        assert 0 == self.outbox.drain(fail, now=next_due)
+        next_due = self.outbox.get_due()[1]
+        assert now + 19 < next_due < now + 21
+        assert 0 == self.outbox.drain(fail, now=next_due)
+        assert ([], None) == self.outbox.get_due()
+        assert 1 == len(os.listdir(self.outbox.failed))
+
+    def test_worker(self):
+        """Make sure the worker thread delivers messages in the background."""
+        sent = []
+        worker = email_outbox.OutboxWorker(self.outbox, sent.append)
+        worker.start()
+        self.outbox.put(self.message)
+        worker.wake()
+        for _ in range(100):
+            if sent:
+                break
+            time.sleep(0.01)
+        worker.stop()
+        worker.join()
+        assert 1 == len(sent)
@@ -0,0 +1,145 @@
+import os
+import smtplib
+import tempfile
+import unittest
+import sys
+from os import path
+from unittest import mock
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import email_utilities
+
+
+class FakeSMTP(object):
+    """A SMTP connection that records the messages sent on it."""
+    connections = []
+
+    def __init__(self, server, port):
+        self.sent = []
+        self.disconnect = False
+        FakeSMTP.connections.append(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def ehlo(self):
+        pass
+
+    def starttls(self):
+        pass
+
+    def login(self, username, password):
+        pass
+
+    def send_message(self, message):
+        if self.disconnect:
+            raise smtplib.SMTPServerDisconnected('Connection unexpectedly '
+                                                 'closed')
+        self.sent.append(message)
+        return {}
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class TestEmailUtilities(unittest.TestCase):
+    """A unit test TestCase class to run tests on the email utilities."""
+
+    def setUp(self):
+        FakeSMTP.connections = []
+        patcher = mock.patch.object(smtplib, 'SMTP', FakeSMTP)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_pool_reuse(self):
+        """Make sure the pool sends many messages on one connection."""
+        messages = [email_utilities.get_message('a@b.c', 'd@e.f', str(n),
+                                                'Text {0}'.format(n), None)
+                    for n in range(5)]
+        with email_utilities.SMTPPool('smtp', 587, 'user', 'pass',
+                                      size=1) as pool:
+            results = pool.send_messages(messages)
+        assert 1 == len(FakeSMTP.connections)
+        assert 5 == len(FakeSMTP.connections[0].sent)
+        assert [(message, {}) for message in messages] == results
+
+    def test_pool_reconnect(self):
+        """Make sure the pool reconnects when the server disconnected."""
+        message = email_utilities.get_message('a@b.c', 'd@e.f', 'Subject',
+                                              'Text', None)
+        pool = email_utilities.SMTPPool('smtp', 587, 'user', 'pass')
+        pool.send(message)
+        FakeSMTP.connections[0].disconnect = True
+        pool.send(message)
+        assert 2 == len(FakeSMTP.connections)
+        assert 1 == len(FakeSMTP.connections[1].sent)
+        # An idle connection past the timeout is replaced.
+        pool.idle_timeout = 0
+        pool.send(message)
+        assert 3 == len(FakeSMTP.connections)
+        pool.close()
+
+    def test_image_cache(self):
+        """Make sure the encoded image is reused until the file changes and
+        the text is only read from a file when asked to."""
+        cache = email_utilities.ImagePartCache(max_bytes=200)
+        with tempfile.TemporaryDirectory() as directory:
+            image = path.join(directory, 'route.png')
+            with open(image, 'wb') as writer:
+                writer.write(b'\x89PNG\r\n\x1a\n' + b'\x00' * 64)
+            with mock.patch.object(email_utilities, '_image_cache', cache):
+                first = email_utilities.get_message('a@b.c', 'd@e.f', 'S',
+                                                    image, image)
+                second = email_utilities.get_message('a@b.c', 'g@h.i', 'S',
+                                                     'Text', image)
+            assert 1 == len(cache.entries)
+            parts = [first.get_payload()[1], second.get_payload()[1]]
+            assert parts[0] is not parts[1]
+            assert 'image/png' == parts[1].get_content_type()
+            assert parts[0].get_payload(decode=True) == \
+                parts[1].get_payload(decode=True)
+            # The path was not mistaken for a file of text.
+            assert image == first.get_payload()[0].get_payload(decode=True) \
+                .decode('utf-8')
+            text_file = path.join(directory, 'event.html')
+            with open(text_file, 'w') as writer:
+                writer.write('<p>Ride safe.</p>')
+            message = email_utilities.get_message('a@b.c', 'd@e.f', 'S',
+                                                  text_file, None, True)
+            assert '<p>Ride safe.</p>' == message.get_payload()[0] \
+                .get_payload(decode=True).decode('utf-8')
+
+            # A changed file is a new entry and the oldest entry is evicted.
+            with open(image, 'ab') as writer:
+                writer.write(b'\x00' * 64)
+            os.utime(image, (0, 0))
+            cache.get_part(image)
+            assert 1 == len(cache.entries)
+            assert cache.size <= cache.max_bytes
+
+    def test_interactive(self):
+        """Make sure a text file given at the prompt is sent as its contents
+        and typed text is sent as it is."""
+        with tempfile.TemporaryDirectory() as directory:
+            text_file = path.join(directory, 'event.html')
+            with open(text_file, 'w') as writer:
+                writer.write('<p>Ride safe.</p>')
+            answers = ['a@b.c', 'd@e.f', 'S', text_file, '', '', '', '',
+                       'a@b.c', 'd@e.f', 'S', '', '<p>Typed.</p>', '', '',
+                       '', '']
+            with mock.patch('builtins.input', side_effect=answers), \
+                    mock.patch.object(email_utilities.getpass, 'getpass'), \
+                    mock.patch.object(email_utilities,
+                                      'send_tls_message') as send:
+                email_utilities.interactive()
+                email_utilities.interactive()
+        texts = [call[0][4].get_payload()[0].get_payload(decode=True)
+                 .decode('utf-8') for call in send.call_args_list]
+        assert ['<p>Ride safe.</p>', '<p>Typed.</p>'] == texts
@@ -0,0 +1,102 @@
+import datetime
+import tempfile
+import unittest
+import sys
+from os import path
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import email_utilities
+import event_pipeline
+import weather_cache
+import weather_changes
+import weather_metrics
+
+from test_weather_scheduler import ASTRONOMY
+from test_weather_scheduler import HOURLY_10_DAY
+
+
+class TestEventPipeline(unittest.TestCase):
+    """A unit test TestCase class to run tests on the event pipeline."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = weather_cache.ForecastCache(self.directory.name)
+        self.cache.put('astronomy', 'MN/Byron', ASTRONOMY)
+        self.cache.put('hourly10day', 'MN/Byron', HOURLY_10_DAY)
+        self.now = datetime.datetime(2017, 3, 20, 12)
+        self.sent = []
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_event(self, pipeline, **kwargs):
+        """Return the result of running the Wednesday event."""
+        return pipeline.run({'comment': 'Ride safe.'}, 'wednesday',
+                            'MN/Byron', datetime.time(19), now=self.now,
+                            **kwargs)
+
+    def test_run(self):
+        """Make sure the event is written as it renders and the message is
+        made from the file and delivered."""
+        weather_metrics.METRICS.reset()
+        pipeline = event_pipeline.EventPipeline(cache=self.cache,
+                                                offline=True,
+                                                send=self.sent.append)
+        text = self.run_event(pipeline)
+        assert 'Ride safe.' in text
+        assert 'SE' in text
+        assert [] == self.sent
+        output = path.join(self.directory.name, 'wednesday.html')
+        email = {'fromaddress': 'organizer@example.com',
+                 'recipients': 'riders@example.com',
+                 'subject': 'Wednesday ride'}
+        assert output == self.run_event(pipeline, path=output, email=email)
+        with open(output, 'r') as reader:
+            assert text == reader.read()
+        assert 1 == len(self.sent)
+        message = self.sent[0]
+        assert 'Wednesday ride' == message['Subject']
+        part = message.get_payload()[0]
+        assert text == part.get_payload(decode=True).decode('utf-8')
+        # The pipeline times the message, email_utilities does not.
+        stages = weather_metrics.METRICS.summary()['stages']
+        assert 1 == stages['mime']['count']
+        assert 1 == stages['deliver']['count']
+
+    def test_changes(self):
+        """Make sure an event that has not changed is not delivered again,
+        and the digest is not saved when the delivery fails."""
+        changes = weather_changes.ChangeDetector(
+            path.join(self.directory.name, 'changes.json'))
+
+        def fail(message):
+            raise OSError('The server is gone.')
+        email = {'recipients': 'riders@example.com'}
+        pipeline = event_pipeline.EventPipeline(cache=self.cache,
+                                                offline=True,
+                                                changes=changes, send=fail)
+        with self.assertRaises(OSError):
+            self.run_event(pipeline, email=email)
+        # Nothing was staged for the next save to remember.
+        assert {} == changes.pending
+        changes.save()
+        assert {} == changes.digests
+        pipeline.send = self.sent.append
+        assert self.run_event(pipeline, email=email) is not None
+        assert self.run_event(pipeline, email=email) is None
+        assert 1 == len(self.sent)
+
+    def test_email_arguments(self):
+        """Make sure the email arguments are parsed from a list without the
+        command line, and an outbox sender puts the message there."""
+        arguments = email_utilities.parse_arguments(
+            ['--day', 'monday', '-r', 'riders@example.com', '--outbox'])
+        assert 'riders@example.com' == arguments.recipients
+        assert arguments.outbox
+        send = email_utilities.get_sender(arguments)
+        assert 'put' == send.__name__
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import datetime
+import json
+import os
+import tempfile
+import unittest
+import sys
+from os import path
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import forecast_archive
+import forecast_table
+import replay_server
+import weather_cache
+import weather_client
+import weather_scheduler
+
+from test_weather_scheduler import HOURLY_10_DAY
+
+
+class TestForecastArchive(unittest.TestCase):
+    """A unit test TestCase class to run tests on the forecast archive."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.archive = forecast_archive.ForecastArchive(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_append_read(self):
+        """Make sure the snapshots read back by issue time and hour."""
+        table = forecast_table.ForecastTable(json.loads(HOURLY_10_DAY))
+        first = datetime.datetime(2017, 3, 12, 6)
+        second = datetime.datetime(2017, 3, 12, 18)
+        assert 2 == self.archive.append('MN/Rochester', table,
+                                        first.timestamp())
+        self.archive.append('MN/Rochester', table, second.timestamp())
+        target = datetime.datetime(2017, 3, 22, 19)
+        with self.archive.open('MN/Rochester') as reader:
+            assert 4 == len(reader)
+            records = reader.forecasts(target)
+            assert [first, second] == [r['issued'] for r in records]
+            assert target == records[0]['hour']
+            assert 40 == records[0]['temp_english']
+            assert 0.02 == records[0]['qpf_english']
+            assert 'Chance of Rain' == records[0]['condition']
+            assert 'SE' == records[0]['wdir_dir']
+            later = reader.forecasts(target, start=second)
+            assert [second] == [r['issued'] for r in later]
+            assert [] == reader.forecasts(datetime.datetime(2017, 3, 13))
+        # The strings are stored once for every snapshot.
+        with open(self.archive.get_path('MN/Rochester', 'strings')) as f:
+            assert sorted(table.strings) == sorted(f.read().split('\n')[:-1])
+        with self.archive.open('MN/Other') as reader:
+            assert 0 == len(reader)
+
+    def test_get_weather(self):
+        """Make sure fetched hourly forecasts are appended to the archive."""
+        server = replay_server.ReplayServer(('127.0.0.1', 0))
+        server.start()
+        self.addCleanup(server.stop)
+        archive_directory = weather_scheduler.ARCHIVE_DIRECTORY
+        weather_scheduler.ARCHIVE_DIRECTORY = self.directory.name
+        self.addCleanup(setattr, weather_scheduler, 'ARCHIVE_DIRECTORY',
+                        archive_directory)
+        with tempfile.TemporaryDirectory() as directory, \
+                weather_client.WeatherClient(base_url=server.url) as client:
+            cache = weather_cache.ForecastCache(directory)
+            target = datetime.datetime(2017, 3, 13, 18)
+            weather_scheduler.get_weather('KEY', 'MN/Rochester', target,
+                                          client, cache, until=target)
+        with self.archive.open('MN/Rochester') as reader:
+            assert 240 == len(reader)
+            assert 1 == len(reader.forecasts(target))
+        assert os.path.isfile(self.archive.get_path('MN/Rochester', 'index'))
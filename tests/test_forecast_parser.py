@@ -0,0 +1,71 @@
+import json
+import unittest
+import sys
+from datetime import datetime
+from os import path
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import forecast_parser
+
+
+EXAMPLE = path.join(path.dirname(path.dirname(path.abspath(__file__))),
+                    'examples', '2017-03-12-hourly10day.json')
+
+
+class TestForecastParser(unittest.TestCase):
+    """A unit test TestCase class to run tests on the forecast parser."""
+
+    def setUp(self):
+        with open(EXAMPLE, 'r') as reader:
+            self.text = reader.read()
+
+    def test_parse_hourly10day(self):
+        """Make sure the records parsed in small chunks match json.loads()."""
+        expected = json.loads(self.text)['hourly_forecast']
+        chunks = forecast_parser.iter_text(self.text, 7)
+        parsed = forecast_parser.parse_hourly10day(chunks)['hourly_forecast']
+        assert len(expected) == len(parsed)
+        for record, forecast in zip(expected, parsed):
+            assert record['temp'] == forecast['temp']
+            assert record['wdir'] == forecast['wdir']
+            assert record['FCTTIME']['pretty'] == forecast['FCTTIME']['pretty']
+            assert 'icon_url' not in forecast
+            assert 'epoch' not in forecast['FCTTIME']
+
+    def test_parse_until(self):
+        """Make sure parsing stops after the record for the until hour."""
+        chunks = forecast_parser.iter_text(self.text)
+        until = datetime(2017, 3, 13, 18, 30)
+        parsed = forecast_parser.parse_hourly10day(chunks, until)
+        forecasts = parsed['hourly_forecast']
+        assert 23 == len(forecasts)
+        last = forecast_parser.get_hour(forecasts[-1]['FCTTIME'])
+        assert datetime(2017, 3, 13, 18) == last
+
+    def test_decode_hourly10day(self):
+        """Make sure decoding all the text and parsing it record by record
+        give the same projected records, with or without an until hour."""
+        chunks = forecast_parser.iter_text(self.text)
+        expected = forecast_parser.parse_hourly10day(chunks)
+        assert expected == forecast_parser.decode_hourly10day(self.text)
+        # An early hour is parsed record by record and a late hour is
+        # decoded all at once, both stop after the until hour.
+        for until in (datetime(2017, 3, 13, 18), datetime(2017, 3, 20, 18)):
+            chunks = forecast_parser.iter_text(self.text)
+            expected = forecast_parser.parse_hourly10day(chunks, until)
+            decoded = forecast_parser.decode_hourly10day(self.text, until)
+            assert expected == decoded
+        with self.assertRaises(ValueError):
+            forecast_parser.decode_hourly10day('{"response": {}}')
+        assert datetime(2017, 3, 12, 20) == \
+            forecast_parser.get_first_hour(self.text)
+        assert forecast_parser.get_first_hour('{"response": {}}') is None
+
+    def test_truncated(self):
+        """Make sure truncated or missing data raises a ValueError."""
+        chunks = forecast_parser.iter_text(self.text[:len(self.text) // 2])
+        with self.assertRaises(ValueError):
+            forecast_parser.parse_hourly10day(chunks)
+        with self.assertRaises(ValueError):
+            forecast_parser.parse_hourly10day(['{"response": {}}'])
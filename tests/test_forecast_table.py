@@ -0,0 +1,81 @@
+import json
+import unittest
+import sys
+from datetime import datetime
+from os import path
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import forecast_table
+
+
+EXAMPLE = path.join(path.dirname(path.dirname(path.abspath(__file__))),
+                    'examples', '2017-03-06-hourly10day.json')
+
+
+class TestForecastTable(unittest.TestCase):
+    """A unit test TestCase class to run tests on the forecast table."""
+
+    def setUp(self):
+        with open(EXAMPLE, 'r') as reader:
+            self.data = json.load(reader)
+        self.table = forecast_table.ForecastTable(self.data)
+
+    def test_values(self):
+        """Make sure every row has the values of the original records."""
+        assert len(self.data['hourly_forecast']) == len(self.table)
+        for index, record in enumerate(self.data['hourly_forecast']):
+            row = forecast_table.ForecastRow(self.table, index)
+            for name, key, subkey, code in forecast_table.COLUMNS:
+                value = record[key][subkey] if subkey else record[key]
+                if value == '-0':
+                    value = '0'
+                assert value == row.text(name), name
+            assert record['FCTTIME']['pretty'] == row.pretty
+
+    def test_get(self):
+        """Make sure rows are found by the hour of a datetime."""
+        row = self.table.get(datetime(2017, 3, 10, 18, 45))
+        assert datetime(2017, 3, 10, 18) == row.hour
+        assert 'March 10, 2017' in row.pretty
+        assert isinstance(row.temp_english, int)
+        assert isinstance(row.qpf_english, float)
+        assert self.table.get(datetime(2016, 3, 10, 18)) is None
+        rows = self.table.between(datetime(2017, 3, 10),
+                                  datetime(2017, 3, 11))
+        assert 24 == len(rows)
+        for index in self.table.where('pop', 50, 100):
+            assert self.table.column('pop')[index] >= 50
+
+    def test_text(self):
+        """Make sure the float columns keep the text of the original data,
+        including the missing value."""
+        record = dict(self.data['hourly_forecast'][0])
+        record['mslp'] = {'english': '29.30', 'metric': '992'}
+        record['qpf'] = {'english': '-9999', 'metric': '-9999'}
+        table = forecast_table.ForecastTable({'hourly_forecast': [record]})
+        row = forecast_table.ForecastRow(table, 0)
+        assert '29.30' == row.text('mslp_english')
+        assert '-9999' == row.text('qpf_english')
+        assert forecast_table.MISSING == row.qpf_english
+
+    def test_find_row(self):
+        """Make sure a record is found without building a table and has the
+        same values as the row of the table."""
+        target = datetime(2017, 3, 10, 18, 45)
+        record = forecast_table.find_row(self.data, target)
+        row = self.table.get(target)
+        assert row.hour == record.hour
+        assert row.pretty == record.pretty
+        for name in forecast_table.TYPES:
+            assert row[name] == record[name], name
+        assert row.text('mslp_english') == record.text('mslp_english')
+        assert forecast_table.find_row(self.data,
+                                       datetime(2016, 3, 10, 18)) is None
+
+    def test_slots(self):
+        """Make sure the row view does not have a per instance dict."""
+        row = self.table.get(datetime(2017, 3, 10, 18))
+        assert not hasattr(row, '__dict__')
+        with self.assertRaises(AttributeError):
+            row.missing
@@ -0,0 +1,103 @@
+import datetime
+import json
+import os
+import tempfile
+import time
+import unittest
+import sys
+from os import path
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import replay_server
+import weather_cache
+import weather_client
+import weather_scheduler
+
+
+class TestReplayServer(unittest.TestCase):
+    """A unit test TestCase class to run tests on the replay server."""
+
+    def serve(self, **kwargs):
+        """Start a replay server on a free port that stops after the test."""
+        server = replay_server.ReplayServer(('127.0.0.1', 0), **kwargs)
+        server.start()
+        self.addCleanup(server.stop)
+        return server
+
+    def test_replay(self):
+        """Make sure the recorded responses are served for each feature."""
+        server = self.serve()
+        with weather_client.WeatherClient(base_url=server.url) as client:
+            results = client.fetch('KEY', 'MN/Byron',
+                                   ['astronomy', 'hourly10day', 'missing'])
+        assert 'sun_phase' in results['astronomy'].json()
+        assert 'hourly_forecast' in results['hourly10day'].json()
+        assert 404 == results['missing'].status_code
+        assert 3 == server.counters['requests']
+
+    def test_faults(self):
+        """Make sure the server injects errors, truncation and latency."""
+        server = self.serve(error_rate=1.0)
+        with weather_client.WeatherClient(base_url=server.url) as client:
+            response = client.get_feature('KEY', 'astronomy', 'MN/Byron')
+        assert 500 == response.status_code
+
+        server = self.serve(truncate_rate=1.0)
+        with weather_client.WeatherClient(base_url=server.url) as client:
+            results = client.fetch('KEY', 'MN/Byron', ['astronomy'])
+        assert isinstance(results['astronomy'], Exception)
+        assert 1 == server.counters['truncated']
+
+        server = self.serve(latency=0.2, bandwidth=1024 * 1024)
+        with weather_client.WeatherClient(base_url=server.url) as client:
+            start = time.monotonic()
+            response = client.get_feature('KEY', 'astronomy', 'MN/Byron')
+            elapsed = time.monotonic() - start
+        assert 200 == response.status_code
+        assert elapsed >= 0.2
+
+    def test_schedule_event(self):
+        """Make sure an event renders from the replay server and that the
+        errors are not cached."""
+        server = self.serve()
+        now = datetime.datetime(2017, 3, 12, 12)
+        start = datetime.time(18)
+        with tempfile.TemporaryDirectory() as directory, \
+                weather_client.WeatherClient(base_url=server.url) as client:
+            cache = weather_cache.ForecastCache(directory)
+            text = weather_scheduler.schedule_event(
+                {}, 'monday', 'KEY', 'MN/Byron', start, client=client,
+                now=now, cache=cache)
+            assert 'Sunset is ' in text
+            assert cache.get('astronomy', 'MN/Byron') is not None
+            data = json.loads(cache.get('hourly10day', 'MN/Byron'))
+            assert data['hourly_forecast']
+
+            server.error_rate = 1.0
+            other = weather_cache.ForecastCache(path.join(directory, 'o'))
+            weather_scheduler.get_weather('KEY', 'MN/Byron', now.date(),
+                                          client=client, cache=other)
+            assert other.get('astronomy', 'MN/Byron') is None
+
+    def test_conditional(self):
+        """Make sure the responses are compressed and that an expired entry
+        is reused when the API answers it was not modified."""
+        server = self.serve()
+        target = datetime.date(2017, 3, 13)
+        with tempfile.TemporaryDirectory() as directory, \
+                weather_client.WeatherClient(base_url=server.url) as client:
+            cache = weather_cache.ForecastCache(directory)
+            first = weather_scheduler.get_weather('KEY', 'MN/Byron',
+                                                  target, client, cache)
+            sent = server.counters['bytes_sent']
+            assert sent < sum(len(body) for body in server.bodies.values())
+            old = 0
+            for feature in ('astronomy', 'hourly10day'):
+                os.utime(cache.get_path(feature, 'MN/Byron'), (old, old))
+            second = weather_scheduler.get_weather('KEY', 'MN/Byron',
+                                                   target, client, cache)
+            assert first == second
+            assert 2 == server.counters['not_modified']
+            assert sent == server.counters['bytes_sent']
+            assert cache.get('hourly10day', 'MN/Byron') is not None
@@ -0,0 +1,77 @@
+import json
+import unittest
+import sys
+from datetime import date
+from datetime import datetime
+from os import path
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import ride_windows
+
+from test_weather_scheduler import ASTRONOMY
+
+
+def get_forecast(hour, temperature, speed, pop='0', windchill='-9999',
+                 mday=20):
+    """Return an hourly_forecast record of the day in March 2017 at the
+    hour."""
+    return {'FCTTIME': {'year': '2017', 'mon': '3', 'mday': str(mday),
+                        'hour': str(hour),
+                        'pretty': '{0}:00 PM CDT on March {1}, 2017'.format(
+                            hour - 12, mday)},
+            'condition': 'Clear',
+            'pop': pop,
+            'qpf': {'english': '0.0', 'metric': '0'},
+            'temp': {'english': str(temperature), 'metric': '0'},
+            'wdir': {'dir': 'NW', 'degrees': '315'},
+            'windchill': {'english': windchill, 'metric': '0'},
+            'wspd': {'english': str(speed), 'metric': '0'},
+            'wx': 'Sunny'}
+
+
+class TestRideWindows(unittest.TestCase):
+    """A unit test TestCase class to run tests on the ride window search."""
+
+    def test_get_windows(self):
+        """Make sure the hours are ranked by the weather and daylight, and
+        the hours too close to sunset are left out."""
+        hourly = {'hourly_forecast': [
+            get_forecast(13, 68, 5),
+            get_forecast(14, 68, 20),
+            get_forecast(15, 68, 5, pop='80'),
+            get_forecast(16, 50, 5, windchill='40'),
+            get_forecast(17, 68, 0),
+            get_forecast(19, 68, 0),
+            get_forecast(14, 60, 10, mday=27)]}
+        astronomy = json.loads(ASTRONOMY)
+        windows = ride_windows.get_windows(astronomy, hourly, 'MN/Byron',
+                                           top=3, context={'comment': 'Ride!'})
+        # The Mondays of the forecast are not mixed together.
+        monday = date(2017, 3, 20)
+        assert sorted(windows) == [monday, date(2017, 3, 27)]
+        hours = [target.hour for _, target, _ in windows[monday]]
+        # Sunset is at 7:12 PM so 7 PM has less than an hour of daylight,
+        # and the calm hour beats the hour with more daylight and some wind.
+        assert hours == [17, 13, 14]
+        scores = [score for score, _, _ in windows[monday]]
+        assert scores == sorted(scores, reverse=True)
+        _, target, context = windows[monday][0]
+        assert target == datetime(2017, 3, 20, 17)
+        assert context['comment'] == 'Ride!'
+        assert context['temperature_english'] == '68'
+        assert context['ride_score'] == scores[0]
+        assert context['location'] == 'MN/Byron'
+        assert 'routes' in context
+        _, target, context = windows[date(2017, 3, 27)][0]
+        assert target == datetime(2017, 3, 27, 14)
+        assert context['event_date'] == 'March 27, 2017'
+        # The windchill is used instead of the temperature when present.
+        ranked = ride_windows.get_windows(astronomy, hourly, 'MN/Byron',
+                                          top=6)
+        assert [target.hour for _, target, _ in ranked[monday]] == \
+            [17, 13, 14, 15, 16]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import datetime
+import json
+import tempfile
+import unittest
+import sys
+from os import path
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import route_catalog
+import weather_scheduler
+
+
+class TestRouteCatalog(unittest.TestCase):
+    """A unit test TestCase class to run tests on the route catalog."""
+
+    def test_get_rows(self):
+        """Make sure the routes are indexed by start point and wind direction
+        and limited to the max miles, shortest first."""
+        catalog = {'days': {'monday': 'School'},
+                   'routes': [{'start': 'School', 'wind': ['N', 'NNE'],
+                               'miles': 30, 'route': 2},
+                              {'start': 'School', 'wind': ['N'],
+                               'miles': 20, 'route': 1,
+                               'image': 'route.png'},
+                              {'start': 'Shop', 'wind': ['N'],
+                               'miles': 10, 'route': 3}]}
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as writer:
+            json.dump(catalog, writer)
+            writer.flush()
+            routes = route_catalog.RouteCatalog(writer.name)
+        assert routes.get_start('Monday') == 'School'
+        assert routes.get_start('Sunday') is None
+        rows = routes.get_rows('School', 'N')
+        assert [row['route'] for row in rows] == [1, 2]
+        assert rows[0]['url'] == route_catalog.ROUTE_URL.format(1)
+        assert rows[0]['image'] == 'route.png'
+        assert rows[1]['image'] == route_catalog.IMAGE_URL.format(2)
+        assert [row['route'] for row in routes.get_rows('School', 'NNE')] \
+            == [2]
+        assert [row['route'] for row in routes.get_rows('School', 'N', 25)] \
+            == [1]
+        assert routes.get_rows('School', 'S') == []
+
+    def test_update_routes(self):
+        """Make sure the context gets the routes of the start point of the
+        day and only the routes that can be ridden before sunset."""
+        monday = datetime.datetime(2017, 3, 20, 19)
+        context = weather_scheduler.update_routes(
+            {'wind_direction': 'SW'}, monday)
+        routes = context['routes']
+        assert routes
+        assert routes == sorted(routes, key=lambda row: row['miles'])
+        context = weather_scheduler.update_routes(
+            {'wind_direction': 'SW', 'daylight_in_hours': 1,
+             'average_speed': '15'}, monday)
+        assert context['routes'] == [row for row in routes
+                                     if row['miles'] <= 15]
+        context = weather_scheduler.update_routes(
+            {'wind_direction': 'SW', 'start': 'Nowhere'}, monday)
+        assert context['routes'] == []
+
+
+if __name__ == '__main__':
+    unittest.main()
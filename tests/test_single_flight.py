@@ -0,0 +1,78 @@
+import datetime
+import tempfile
+import threading
+import time
+import unittest
+import sys
+from os import path
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import replay_server
+import single_flight
+import weather_cache
+import weather_client
+import weather_scheduler
+
+
+def run_threads(count, target):
+    """Call the target on count threads at the same time and return the
+    results in thread order."""
+    results = [None] * count
+
+    def run(index):
+        try:
+            results[index] = target()
+        except Exception as error:
+            results[index] = error
+    threads = [threading.Thread(target=run, args=(index,))
+               for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight(unittest.TestCase):
+    """A unit test TestCase class to run tests on the single flight calls."""
+
+    def test_do(self):
+        """Make sure concurrent calls for a key share one call and result."""
+        flights = single_flight.SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return {'calls': len(calls)}
+        results = run_threads(4, lambda: flights.do('key', slow))
+        assert 1 == len(calls)
+        assert all(result is results[0] for result in results)
+        assert {} == flights.calls
+        # The next call after the flight landed is a new call.
+        assert {'calls': 2} == flights.do('key', slow)
+
+        def fail():
+            time.sleep(0.2)
+            raise ValueError('failed')
+        results = run_threads(3, lambda: flights.do('key', fail))
+        assert all(isinstance(result, ValueError) for result in results)
+        assert {} == flights.calls
+
+    def test_get_weather(self):
+        """Make sure concurrent get_weather() calls for a location send each
+        API request once."""
+        server = replay_server.ReplayServer(('127.0.0.1', 0), latency=0.3)
+        server.start()
+        self.addCleanup(server.stop)
+        target = datetime.datetime(2017, 3, 13, 18)
+        with tempfile.TemporaryDirectory() as directory, \
+                weather_client.WeatherClient(base_url=server.url) as client:
+            cache = weather_cache.ForecastCache(directory)
+            results = run_threads(3, lambda: weather_scheduler.get_weather(
+                'KEY', 'MN/Byron', target, client, cache))
+        assert 2 == server.counters['requests']
+        for astronomy_data, hourly10day_data in results:
+            assert 'sun_phase' in astronomy_data
+            assert hourly10day_data == results[0][1]
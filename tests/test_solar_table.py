@@ -0,0 +1,73 @@
+import datetime
+import json
+import tempfile
+import unittest
+import sys
+from os import path
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import replay_server
+import solar_table
+import weather_cache
+import weather_client
+import weather_scheduler
+
+EXAMPLES = path.join(path.dirname(path.dirname(path.abspath(__file__))),
+                     'examples')
+
+
+def get_minutes(phase):
+    """Return the minutes after midnight of an API sun phase time."""
+    return int(phase['hour']) * 60 + int(phase['minute'])
+
+
+class TestSolarTable(unittest.TestCase):
+    """A unit test TestCase class to run tests on the computed sun."""
+
+    def test_astronomy_data(self):
+        """Make sure the computed sun is within two minutes of the API."""
+        table = solar_table.get_table('MN/Rochester')
+        for name in ('2017-03-04', '2017-03-12'):
+            with open(path.join(EXAMPLES, name + '-astronomy.json')) as f:
+                expected = json.load(f)['sun_phase']
+            day = datetime.datetime.strptime(name, '%Y-%m-%d').date()
+            actual = table.get_astronomy_data(day)['sun_phase']
+            for phase in ('sunrise', 'sunset'):
+                assert abs(get_minutes(expected[phase]) -
+                           get_minutes(actual[phase])) <= 2
+        assert solar_table.get_table('Unknown/Place') is None
+
+    def test_get_tables(self):
+        """Make sure a year of many locations is computed in one call and
+        that the sun can stay up all day."""
+        locations = ['{0},{1}'.format(latitude, -93)
+                     for latitude in range(-60, 90, 10)]
+        tables = solar_table.get_tables(locations + ['Unknown/Place'], 2016)
+        assert sorted(locations) == sorted(tables)
+        for table in tables.values():
+            assert 366 == len(table.years[2016][0])
+        polar = tables['80,-93'].get(datetime.date(2016, 6, 21))
+        assert (None, None) == polar
+        assert {} == tables['80,-93'].get_astronomy_data(
+            datetime.date(2016, 6, 21))['sun_phase']
+        sunrise, sunset = tables['40,-93'].get(datetime.date(2016, 6, 21))
+        assert sunrise < sunset
+
+    def test_get_weather(self):
+        """Make sure the astronomy API is not requested for a location with
+        coordinates and that the sunset is of the target date."""
+        server = replay_server.ReplayServer(('127.0.0.1', 0))
+        server.start()
+        self.addCleanup(server.stop)
+        target = datetime.datetime(2017, 6, 21, 18)
+        with tempfile.TemporaryDirectory() as directory, \
+                weather_client.WeatherClient(base_url=server.url) as client:
+            cache = weather_cache.ForecastCache(directory)
+            astronomy_data, hourly10day_data = weather_scheduler.get_weather(
+                'KEY', 'MN/Rochester', target, client, cache)
+        assert 1 == server.counters['requests']
+        assert isinstance(astronomy_data, solar_table.SunTable)
+        context = weather_scheduler.update_context({}, target, astronomy_data,
+                                                   hourly10day_data)
+        assert ' 8:57 PM' == context['sunset_time']
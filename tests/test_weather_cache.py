@@ -0,0 +1,75 @@
+import os
+import tempfile
+import time
+import unittest
+import sys
+from datetime import datetime
+from os import path
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import weather_cache
+import weather_scheduler
+
+from test_weather_scheduler import ASTRONOMY
+from test_weather_scheduler import HOURLY_10_DAY
+
+
+class TestWeatherCache(unittest.TestCase):
+    """A unit test TestCase class to run tests on the forecast cache."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = weather_cache.ForecastCache(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_put_get(self):
+        """Make sure an entry is returned until the time to live expires."""
+        self.cache.put('hourly10day', 'MN/Rochester', HOURLY_10_DAY)
+        text = self.cache.get('hourly10day', 'MN/Rochester')
+        assert HOURLY_10_DAY == text
+        assert self.cache.get('astronomy', 'MN/Rochester') is None
+        # Age the entry past the hourly time to live.
+        old = time.time() - 2 * 60 * 60
+        os.utime(self.cache.get_path('hourly10day', 'MN/Rochester'),
+                 (old, old))
+        assert self.cache.get('hourly10day', 'MN/Rochester') is None
+        assert HOURLY_10_DAY == self.cache.get('hourly10day', 'MN/Rochester',
+                                               stale=True)
+
+    def test_evict(self):
+        """Make sure the oldest entries are removed when over max_bytes."""
+        self.cache.max_bytes = len(HOURLY_10_DAY) * 2
+        for number, location in enumerate(['MN/A', 'MN/B', 'MN/C']):
+            self.cache.put('hourly10day', location, HOURLY_10_DAY)
+            old = time.time() - 100 + number
+            os.utime(self.cache.get_path('hourly10day', location),
+                     (old, old))
+        self.cache.evict()
+        assert self.cache.get('hourly10day', 'MN/A') is None
+        assert self.cache.get('hourly10day', 'MN/C') is not None
+        assert 2 == len(os.listdir(self.directory.name))
+
+    def test_validators(self):
+        """Make sure the validators are stored and evicted with the entry."""
+        validators = {'etag': '"abc"', 'last_modified': 'Sun, 12 Mar 2017'}
+        self.cache.put('hourly10day', 'MN/Rochester', HOURLY_10_DAY,
+                       validators)
+        assert validators == self.cache.get_validators('hourly10day',
+                                                       'MN/Rochester')
+        assert {} == self.cache.get_validators('astronomy', 'MN/Rochester')
+        self.cache.max_bytes = 0
+        self.cache.evict()
+        assert [] == os.listdir(self.directory.name)
+
+    def test_get_weather_offline(self):
+        """Make sure get_weather() renders only from the cache offline."""
+        self.cache.put('astronomy', 'MN/Byron', ASTRONOMY)
+        self.cache.put('hourly10day', 'MN/Byron', HOURLY_10_DAY)
+        target = datetime(2017, 3, 22, 19, 00)
+        astronomy, hourly10day = weather_scheduler.get_weather(
+            None, 'MN/Byron', target, cache=self.cache, offline=True)
+        assert '12' == astronomy['sun_phase']['sunset']['minute']
+        assert 2 == len(hourly10day['hourly_forecast'])
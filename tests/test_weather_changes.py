@@ -0,0 +1,91 @@
+import datetime
+import tempfile
+import unittest
+import sys
+from os import path
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import event_pipeline
+import weather_cache
+import weather_changes
+import weather_scheduler
+
+from test_weather_scheduler import ASTRONOMY
+from test_weather_scheduler import HOURLY_10_DAY
+
+
+class TestWeatherChanges(unittest.TestCase):
+    """A unit test TestCase class to run tests on the change detection."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = weather_cache.ForecastCache(self.directory.name)
+        self.cache.put('astronomy', 'MN/Rochester', ASTRONOMY)
+        self.cache.put('hourly10day', 'MN/Rochester', HOURLY_10_DAY)
+        self.path = path.join(self.directory.name, 'changes.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def schedule(self, changes, comment='Ride safe.'):
+        """Return the Wednesday event rendered from the cached data."""
+        return weather_scheduler.schedule_event(
+            {'comment': comment}, 'wednesday', None, 'MN/Rochester',
+            datetime.time(19), offline=True, cache=self.cache,
+            now=datetime.datetime(2017, 3, 20, 12), changes=changes)
+
+    def deliver(self, changes, comment='Ride safe.'):
+        """Run the Wednesday event on the pipeline, which saves the digest
+        after the event is delivered."""
+        pipeline = event_pipeline.EventPipeline(cache=self.cache,
+                                                offline=True,
+                                                changes=changes)
+        return pipeline.run({'comment': comment}, 'wednesday',
+                            'MN/Rochester', datetime.time(19),
+                            now=datetime.datetime(2017, 3, 20, 12))
+
+    def test_changed(self):
+        """Make sure an event is skipped until the context changes and only
+        after the digest was saved."""
+        changes = weather_changes.ChangeDetector(self.path)
+        assert self.schedule(changes) is not None
+        # Rendering an event does not stage the digest for another save.
+        assert {} == changes.pending
+        assert self.schedule(changes) is not None
+        assert self.deliver(changes) is not None
+        assert self.schedule(changes) is None
+        # A new detector reads the saved digests.
+        changes = weather_changes.ChangeDetector(self.path)
+        assert self.schedule(changes) is None
+        assert self.schedule(changes, 'Bring a light.') is not None
+
+    def test_trigger(self):
+        """Make sure only the trigger fields of the context are compared."""
+        changes = weather_changes.ChangeDetector(
+            self.path, ['wind_direction', 'quantitative_precipitation'])
+        assert self.deliver(changes) is not None
+        assert self.schedule(changes, 'Bring a light.') is None
+        context = {'wind_direction': 'SE',
+                   'quantitative_precipitation': {'english': '0.02',
+                                                  'metric': '1'},
+                   'event_date': 'March 22, 2017'}
+        # The other context keys and the template are not part of it.
+        digest = changes.get_digest(context, None)
+        assert not changes.is_changed('wednesday', 'MN/Rochester', digest)
+        context['wind_direction'] = 'NW'
+        digest = changes.get_digest(context, None)
+        assert changes.is_changed('wednesday', 'MN/Rochester', digest)
+
+    def test_trigger_date(self):
+        """Make sure the same weather on another date is a new event."""
+        changes = weather_changes.ChangeDetector(self.path, ['wind_direction'])
+        context = {'wind_direction': 'SE', 'event_date': 'March 22, 2017'}
+        changes.update('wednesday', 'MN/Rochester',
+                       changes.get_digest(context, None))
+        changes.save()
+        digest = changes.get_digest(context, None)
+        assert not changes.is_changed('wednesday', 'MN/Rochester', digest)
+        context['event_date'] = 'March 29, 2017'
+        digest = changes.get_digest(context, None)
+        assert changes.is_changed('wednesday', 'MN/Rochester', digest)
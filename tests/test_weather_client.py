@@ -0,0 +1,81 @@
+import json
+import threading
+import time
+import unittest
+import sys
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from os import path
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import weather_client
+
+
+DELAY = 0.5  # The seconds the fake API waits before each response.
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    """Respond to every request with the feature name after a delay."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(DELAY)
+        feature = self.path.split('/')[3]
+        body = json.dumps({'feature': feature}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestWeatherClient(unittest.TestCase):
+    """A unit test TestCase class to run tests on the weather client."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), SlowHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:{0}'.format(self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_fetch_concurrent(self):
+        """Make sure fetch() requests the features at the same time."""
+        with weather_client.WeatherClient(base_url=self.url) as client:
+            start = time.monotonic()
+            results = client.fetch('KEY', 'MN/Rochester',
+                                   ['astronomy', 'hourly10day'])
+            elapsed = time.monotonic() - start
+        assert 'astronomy' == results['astronomy'].json()['feature']
+        assert 'hourly10day' == results['hourly10day'].json()['feature']
+        assert elapsed < DELAY * 1.8
+
+    def test_fetch_deadline(self):
+        """Make sure fetch() returns a TimeoutError after the deadline."""
+        with weather_client.WeatherClient(deadline=DELAY / 5,
+                                          base_url=self.url) as client:
+            results = client.fetch('KEY', 'MN/Rochester', ['astronomy'])
+        assert isinstance(results['astronomy'], TimeoutError)
+
+    def test_deadline_frees_threads(self):
+        """Make sure a request that missed the deadline stops, so the next
+        fetch is not queued behind it."""
+        with weather_client.WeatherClient(deadline=DELAY / 5, workers=1,
+                                          base_url=self.url) as client:
+            results = client.fetch('KEY', 'MN/Rochester', ['astronomy'])
+            assert isinstance(results['astronomy'], TimeoutError)
+            client.deadline = DELAY * 4
+            start = time.monotonic()
+            results = client.fetch('KEY', 'MN/Rochester', ['hourly10day'])
+            elapsed = time.monotonic() - start
+        assert 'hourly10day' == results['hourly10day'].json()['feature']
+        # Without the timeout the first request holds the thread for DELAY.
+        assert elapsed < DELAY * 1.5
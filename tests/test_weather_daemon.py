@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+import sys
+from datetime import datetime
+from datetime import time
+from datetime import timedelta
+from os import path
+from unittest import mock
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import email_outbox
+import weather_daemon
+import weather_scheduler
+
+from test_weather_scheduler import ASTRONOMY
+from test_weather_scheduler import HOURLY_10_DAY
+
+
+class TestWeatherDaemon(unittest.TestCase):
+    """A unit test TestCase class to run tests on the weather daemon."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        patcher = mock.patch.object(weather_scheduler, 'get_weather')
+        self.get_weather = patcher.start()
+        self.get_weather.return_value = (json.loads(ASTRONOMY),
+                                         json.loads(HOURLY_10_DAY))
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_datetime(self):
+        """Make sure get_datetime() uses the now argument."""
+        target = weather_scheduler.get_datetime('monday', time(18),
+                                                datetime(2017, 3, 8, 12))
+        assert datetime(2017, 3, 13, 18) == target
+        target = weather_scheduler.get_datetime('monday', time(18),
+                                                datetime(2017, 3, 13, 12))
+        assert datetime(2017, 3, 13, 18) == target
+
+    def test_run_pending(self):
+        """Make sure jobs fire at their run time every day."""
+        jobs = [{'day': 'monday', 'run': '8:00 PM'},
+                {'day': 'wednesday', 'run': '9:00 PM',
+                 'email': {'recipients': 'riders@example.com',
+                           'subject': 'Wednesday ride'}}]
+        outbox = email_outbox.Outbox(path.join(self.directory.name, 'outbox'))
+        output = path.join(self.directory.name, 'output')
+        daemon = weather_daemon.Daemon(jobs, 'KEY', output, outbox=outbox,
+                                       now=datetime(2017, 3, 12, 12))
+        assert 0 == daemon.run_pending(datetime(2017, 3, 12, 19, 59))
+        assert 1 == daemon.run_pending(datetime(2017, 3, 12, 20, 0))
+        # The next Monday after the run time at the default 6:00 PM.
+        target = self.get_weather.call_args[0][2]
+        assert datetime(2017, 3, 13, 18, 0) == target
+        assert 1 == daemon.run_pending(datetime(2017, 3, 12, 21, 0))
+        due = outbox.get_due()[0]
+        assert 1 == len(due)
+        with open(due[0], 'r') as reader:
+            assert 'Wednesday ride' in reader.read()
+        assert ['MN_Rochester-monday-1800.html',
+                'MN_Rochester-wednesday-1800.html'] == \
+            sorted(os.listdir(output))
+        # Both jobs are scheduled again for the next day.
+        assert 2 == len(daemon.heap)
+        assert datetime(2017, 3, 13, 20, 0) == daemon.heap[0][0]
+
+    def test_deliver(self):
+        """Make sure the daemon delivers the outbox when it has a send
+        function, and stops the delivery thread when it stops."""
+        jobs = [{'day': 'wednesday', 'run': '9:00 PM',
+                 'email': {'recipients': 'riders@example.com',
+                           'subject': 'Wednesday ride'}}]
+        outbox = email_outbox.Outbox(path.join(self.directory.name, 'outbox'))
+        sent = []
+
+        def send(message):
+            sent.append(message)
+            daemon.stop()
+        # Schedule the job in the past so it fires as soon as it runs.
+        now = datetime.now() - timedelta(days=2)
+        daemon = weather_daemon.Daemon(jobs, 'KEY', self.directory.name,
+                                       outbox=outbox, now=now, send=send)
+        timer = threading.Timer(10, daemon.stop)
+        timer.start()
+        daemon.run()
+        timer.cancel()
+        assert 1 == len(sent)
+        assert 'Wednesday ride' == sent[0]['Subject']
+        assert [] == outbox.get_due()[0]
+        assert daemon.worker is None
@@ -0,0 +1,85 @@
+import tempfile
+import unittest
+import sys
+from os import path
+from unittest import mock
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import replay_server
+import weather_cache
+import weather_client
+import weather_fanout
+import weather_scheduler
+
+
+class FakeClock(object):
+    """A clock that only moves when something sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestWeatherFanout(unittest.TestCase):
+    """A unit test TestCase class to run tests on the location fan out."""
+
+    def test_rate_limiter(self):
+        """Make sure the limiter waits for a token from every bucket."""
+        clock = FakeClock()
+        limiter = weather_fanout.RateLimiter(2, 3, clock, clock.sleep)
+        assert 0 == limiter.acquire()
+        assert 0 == limiter.acquire()
+        # The minute bucket refills one token every 30 seconds.
+        assert 30 == limiter.acquire()
+        # The day bucket refills one token every 8 hours, less the 30
+        # seconds it refilled while waiting for the minute bucket.
+        assert 8 * 60 * 60 - 30 == round(limiter.acquire())
+        assert 0 == weather_fanout.RateLimiter(None, None).try_acquire(100)
+
+    def test_fetch_locations(self):
+        """Make sure every location is requested within the quota."""
+        server = replay_server.ReplayServer(('127.0.0.1', 0))
+        server.start()
+        self.addCleanup(server.stop)
+        clock = FakeClock()
+        limiter = weather_fanout.RateLimiter(4, None, clock, clock.sleep)
+        locations = ['MN/Kasson', 'MN/Stewartville', 'MN/Byron',
+                     'MN/Kasson']
+        with tempfile.TemporaryDirectory() as directory, \
+                weather_client.WeatherClient(base_url=server.url) as client:
+            cache = weather_cache.ForecastCache(directory)
+            results = list(weather_fanout.fetch_locations(
+                'KEY', locations, client=client, cache=cache,
+                limiter=limiter))
+        assert sorted(set(locations)) == sorted(r[0] for r in results)
+        for location, astronomy_data, hourly10day_data, error in results:
+            assert error is None
+            assert 'sun_phase' in astronomy_data
+            assert hourly10day_data['hourly_forecast']
+        assert 6 == server.counters['requests']
+        # Six requests at four a minute waits for two more tokens.
+        assert 30 == round(sum(clock.sleeps))
+
+    def test_fetch_error(self):
+        """Make sure an error getting one location is yielded for it and
+        does not stop the other locations."""
+        def get_weather(key, location, *args, **kwargs):
+            if location == 'MN/Kasson':
+                raise OSError('The cache is full.')
+            return {'sun_phase': {}}, {'hourly_forecast': []}
+        with mock.patch.object(weather_scheduler, 'get_weather',
+                               side_effect=get_weather):
+            results = sorted(weather_fanout.fetch_locations(
+                None, ['MN/Kasson', 'MN/Byron'], offline=True))
+        assert ['MN/Byron', 'MN/Kasson'] == [r[0] for r in results]
+        assert results[0][3] is None
+        assert results[1][1] is None
+        assert 'The cache is full.' in results[1][3]
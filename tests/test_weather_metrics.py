@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+import unittest
+import sys
+from os import path
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import weather_metrics
+
+
+class TestWeatherMetrics(unittest.TestCase):
+    """A unit test TestCase class to run tests on the run metrics."""
+
+    def setUp(self):
+        self.metrics = weather_metrics.Metrics()
+
+    def test_summary(self):
+        """Make sure stages and counters are in the summary."""
+        with self.metrics.time('fetch'):
+            pass
+        self.metrics.record('fetch', 2.0)
+        self.metrics.increment('cache_hits')
+        self.metrics.increment('bytes_downloaded', 1024)
+        summary = self.metrics.summary()
+        assert 2 == summary['stages']['fetch']['count']
+        assert 2.0 == summary['stages']['fetch']['max_seconds']
+        assert summary['stages']['fetch']['seconds'] >= 2.0
+        assert {'cache_hits': 1, 'bytes_downloaded': 1024} == \
+            summary['counters']
+
+    def test_write(self):
+        """Make sure the JSON and Prometheus files are written."""
+        self.metrics.record('render', 0.5)
+        self.metrics.increment('retries', 3)
+        with tempfile.TemporaryDirectory() as directory:
+            json_path = path.join(directory, 'metrics.json')
+            prometheus_path = path.join(directory, 'weather.prom')
+            self.metrics.write_json(json_path)
+            self.metrics.write_prometheus(prometheus_path)
+            with open(json_path, 'r') as reader:
+                summary = json.load(reader)
+            with open(prometheus_path, 'r') as reader:
+                lines = reader.read().splitlines()
+            assert ['metrics.json', 'weather.prom'] == \
+                sorted(os.listdir(directory))
+        assert 1 == summary['stages']['render']['count']
+        assert 'weather_scheduler_stage_seconds_total{stage="render"} 0.5' \
+            in lines
+        assert 'weather_scheduler_retries_total 3' in lines
+        assert '# TYPE weather_scheduler_retries_total counter' in lines
+
+    def test_merge(self):
+        """Make sure the summary of other metrics adds to these metrics."""
+        other = weather_metrics.Metrics()
+        other.record('render', 2.0)
+        other.increment('retries', 2)
+        self.metrics.record('render', 0.5)
+        self.metrics.merge(other.summary())
+        summary = self.metrics.summary()
+        assert 2 == summary['stages']['render']['count']
+        assert 2.5 == summary['stages']['render']['seconds']
+        assert 2.0 == summary['stages']['render']['max_seconds']
+        assert 2 == summary['counters']['retries']
+
+    def test_timed(self):
+        """Make sure the timed decorator records the stage in METRICS."""
+        @weather_metrics.timed('test_stage')
+        def function(value):
+            return value * 2
+        assert 4 == function(2)
+        stages = weather_metrics.METRICS.summary()['stages']
+        assert stages['test_stage']['count'] >= 1
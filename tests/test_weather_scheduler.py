@@ -1,11 +1,16 @@
 import json
+import os
+import tempfile
 import unittest
 import sys
 from datetime import datetime
 from os import path
+from unittest import mock
 # Have to append ../../ to the system path because this test is not a module.
 sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
 
+import forecast_table
+import weather_cache
 import weather_scheduler
 
 
@@ -269,3 +274,77 @@ class TestWeatherScheduler(unittest.TestCase):
         assert 'SE' == updated['wind_direction']
         assert 'wind_speed_english' in updated
         assert '8' == updated['wind_speed_english']
+
+    def test_update_context_month(self):
+        """Make sure update_context() matches the month as well as the day
+        when the forecast crosses a month boundary."""
+        hourly10day = json.loads(HOURLY_10_DAY)
+        april = json.loads(HOURLY_10_DAY)['hourly_forecast'][1]
+        april['FCTTIME']['mon'] = '4'
+        april['wdir']['dir'] = 'NW'
+        hourly10day['hourly_forecast'].insert(0, april)
+        index = forecast_table.ForecastTable(hourly10day)
+        target_datetime = datetime(2017, 3, 22, 19, 30)
+        updated = weather_scheduler.update_context({}, target_datetime,
+                                                   json.loads(ASTRONOMY),
+                                                   index)
+        assert 'SE' == updated['wind_direction']
+        forecasts = index.between(datetime(2017, 3, 12),
+                                  datetime(2017, 3, 23))
+        assert [20, 19] == [row.hour.hour for row in forecasts]
+
+    def test_get_template(self):
+        """Make sure get_template() compiles each template once and keeps
+        the bytecode on disk."""
+        with tempfile.TemporaryDirectory() as directory:
+            with mock.patch.object(weather_scheduler, 'TEMPLATE_CACHE',
+                                   directory), \
+                    mock.patch.object(weather_scheduler, '_environment', None):
+                template = weather_scheduler.get_template('Monday')
+                assert template is weather_scheduler.get_template('monday')
+                assert 1 == len(os.listdir(directory))
+
+    def test_schedule_batch(self):
+        """Make sure schedule_batch() writes every job, requests the
+        weather once per location and fails only the jobs of a location
+        without weather or that would overwrite the file of another job."""
+        with tempfile.TemporaryDirectory() as directory:
+            cache = weather_cache.ForecastCache(path.join(directory, 'cache'))
+            cache.put('astronomy', 'MN/Rochester', ASTRONOMY)
+            cache.put('hourly10day', 'MN/Rochester', HOURLY_10_DAY)
+            jobs = [{'day': 'monday', 'location': 'MN/Rochester',
+                     'context': 'comment=Bring a light.'},
+                    {'day': 'wednesday', 'time': '5:30 PM',
+                     'location': 'MN/Rochester',
+                     'context': {'comment': 'Ride safe.'}},
+                    {'day': 'monday', 'location': 'MN/Kasson'},
+                    {'day': 'monday', 'time': '7:00 PM',
+                     'location': 'MN/Rochester'},
+                    {'day': 'monday', 'location': 'MN/Rochester',
+                     'output': 'MN_Rochester-monday-1900.html'}]
+            get_weather = weather_scheduler.get_weather
+            output = path.join(directory, 'output')
+            with mock.patch.object(weather_scheduler, 'get_weather') as mocked:
+                mocked.side_effect = lambda *args, **kwargs: get_weather(
+                    *args, **dict(kwargs, cache=cache))
+                results = weather_scheduler.schedule_batch(jobs, None,
+                                                           output,
+                                                           offline=True)
+            assert 2 == mocked.call_count
+            assert [0, 1, 2, 3, 4] == [index for index, _, _ in results]
+            paths = [written for _, written, _ in results]
+            assert paths[2] is None
+            assert 'The weather for MN/Kasson is not available.' == \
+                results[2][2]
+            # The events of a day at two times do not share a file.
+            assert paths[0] != paths[3]
+            assert paths[4] is None
+            assert 'already written by job 3' in results[4][2]
+            names = sorted(os.listdir(output))
+            assert ['MN_Rochester-monday-1800.html',
+                    'MN_Rochester-monday-1900.html',
+                    'MN_Rochester-wednesday-1730.html'] == names
+            with open(paths[1], 'r') as reader:
+                text = reader.read()
+            assert 'Ride safe.' in text
+            assert '5:30 PM' in text
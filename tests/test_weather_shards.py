@@ -0,0 +1,115 @@
+import concurrent.futures
+import concurrent.futures.process
+import os
+import tempfile
+import unittest
+import sys
+from os import path
+from unittest import mock
+# Have to append ../../ to the system path because this test is not a module.
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+import replay_server
+import weather_cache
+import weather_client
+import weather_fanout
+import weather_metrics
+import weather_shards
+
+from test_weather_fanout import FakeClock
+from test_weather_scheduler import ASTRONOMY
+from test_weather_scheduler import HOURLY_10_DAY
+
+
+class TestWeatherShards(unittest.TestCase):
+    """A unit test TestCase class to run tests on the sharded runner."""
+
+    def test_run_shards(self):
+        """Make sure every job is rendered on the processes, the weather is
+        requested once per location and the failures, and the jobs that
+        would overwrite the file of another job, are reported."""
+        server = replay_server.ReplayServer(('127.0.0.1', 0))
+        server.start()
+        self.addCleanup(server.stop)
+        clock = FakeClock()
+        limiter = weather_fanout.RateLimiter(None, None, clock, clock.sleep)
+        jobs = [{'day': 'monday', 'location': 'MN/Byron',
+                 'context': 'comment=Bring a light.'},
+                {'day': 'wednesday', 'time': '5:30 PM',
+                 'location': 'MN/Byron', 'context': {'comment': 'Ride safe.'}},
+                {'day': 'monday', 'location': 'MN/Kasson'},
+                {'day': 'monday', 'time': 'noon', 'location': 'MN/Kasson'},
+                {'day': 'wednesday', 'time': '5:30 PM',
+                 'location': 'MN/Byron'}]
+        with tempfile.TemporaryDirectory() as directory, \
+                weather_client.WeatherClient(base_url=server.url) as client:
+            cache = weather_cache.ForecastCache(path.join(directory, 'cache'))
+            output = path.join(directory, 'output')
+            results = sorted(weather_shards.run_shards(
+                jobs, 'KEY', output, client=client, cache=cache, processes=2,
+                limiter=limiter))
+            names = sorted(os.listdir(output))
+            with open(results[1][1], 'r') as reader:
+                text = reader.read()
+            # The responses were cached after the workers decoded them.
+            assert cache.get('hourly10day', 'MN/Byron') is not None
+            assert cache.get('astronomy', 'MN/Kasson') is not None
+        assert [0, 1, 2, 3, 4] == [index for index, _, _ in results]
+        assert ['MN_Byron-monday-1800.html', 'MN_Byron-wednesday-1730.html',
+                'MN_Kasson-monday-1800.html'] == names
+        assert 'Ride safe.' in text
+        assert '5:30 PM' in text
+        assert results[3][1] is None
+        assert 'ValueError' in results[3][2]
+        # The same day and time as job 1 is not written by two processes.
+        assert results[4][1] is None
+        assert 'already written by job 1' in results[4][2]
+        # Two features for each of the two locations.
+        assert 4 == server.counters['requests']
+        stages = weather_metrics.METRICS.summary()['stages']
+        assert stages['render']['count'] >= 3
+
+    def test_offline(self):
+        """Make sure a location that is not in the cache fails its jobs."""
+        with tempfile.TemporaryDirectory() as directory:
+            cache = weather_cache.ForecastCache(path.join(directory, 'cache'))
+            results = list(weather_shards.run_shards(
+                [{'location': 'MN/Byron'}], None,
+                path.join(directory, 'output'), cache=cache, offline=True,
+                processes=1))
+        assert 1 == len(results)
+        index, output, error = results[0]
+        assert 0 == index
+        assert output is None
+        assert 'not in the cache' in error
+
+    def test_broken_pool(self):
+        """Make sure the jobs the broken pool refused are failed instead of
+        stopping the other results."""
+        broken = concurrent.futures.process.BrokenProcessPool('Gone.')
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch.object(concurrent.futures.ProcessPoolExecutor,
+                                  'submit', side_effect=broken):
+            cache = weather_cache.ForecastCache(path.join(directory, 'cache'))
+            cache.put('astronomy', 'MN/Byron', ASTRONOMY)
+            cache.put('hourly10day', 'MN/Byron', HOURLY_10_DAY)
+            results = sorted(weather_shards.run_shards(
+                [{'day': day, 'location': 'MN/Byron'}
+                 for day in ('monday', 'tuesday', 'friday')], None,
+                path.join(directory, 'output'), cache=cache, offline=True,
+                processes=2))
+        assert [0, 1, 2] == [index for index, _, _ in results]
+        assert all(output is None for _, output, _ in results)
+        assert all('BrokenProcessPool' in error for _, _, error in results)
+
+    def test_split_jobs(self):
+        """Make sure the jobs are split in turns in up to count shards."""
+        jobs = list(enumerate('abcde'))
+        assert [[(0, 'a'), (2, 'c'), (4, 'e')], [(1, 'b'), (3, 'd')]] == \
+            weather_shards.split_jobs(jobs, 2)
+        assert [[(0, 'a')], [(1, 'b')]] == \
+            weather_shards.split_jobs(jobs[:2], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+"""
+weather_cache is Python code to keep weather API responses on disk.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import datetime
+import json
+import os
+import tempfile
+import time
+
+from urllib.parse import quote
+
+
+DIRECTORY = os.getenv('WEATHER_CACHE',
+                      os.path.join(os.path.expanduser('~'), '.cache',
+                                   'weather_scheduler'))
+MAX_BYTES = 16 * 1024 * 1024  # Evict the oldest entries above this size.
+# The seconds each API feature stays fresh, None is until the end of the day.
+TTL = {'astronomy': None,
+       'hourly10day': 60 * 60}
+DEFAULT_TTL = 60 * 60
+
+_cache = None  # The shared cache, created on the first get_cache() call.
+
+
+class ForecastCache(object):
+    """A directory of API response bodies keyed by feature and location that
+    expire after a time to live per feature."""
+
+    def __init__(self, directory=DIRECTORY, ttl=None, max_bytes=MAX_BYTES):
+        """Create the cache directory if it does not exist.
+        :param str directory: The path to the directory to store entries in.
+        :param dict ttl: The feature name to seconds to live, None is a day.
+        :param int max_bytes: The total size of entries to keep on disk."""
+        self.directory = directory
+        self.ttl = dict(TTL)
+        if ttl:
+            self.ttl.update(ttl)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_path(self, feature, location):
+        """Return the path of the entry for the feature and location."""
+        name = '{0}-{1}.json'.format(feature, quote(location, safe=''))
+        return os.path.join(self.directory, name)
+
+    def get_validators_path(self, feature, location):
+        """Return the path of the HTTP validators for the entry."""
+        return self.get_path(feature, location)[:-len('.json')] + \
+            '.validators'
+
+    def is_fresh(self, feature, modified, now=None):
+        """Return True when an entry written at the modified epoch time has
+        not outlived the time to live of the feature."""
+        if now is None:
+            now = time.time()
+        ttl = self.ttl.get(feature, DEFAULT_TTL)
+        if ttl is None:
+            # The entry is fresh for the rest of the day it was written.
+            written = datetime.date.fromtimestamp(modified)
+            return written == datetime.date.fromtimestamp(now)
+        return now - modified < ttl
+
+    def get(self, feature, location, stale=False):
+        """Return the cached text for the feature and location, or None when
+        there is no entry or the entry has expired and stale is False."""
+        path = self.get_path(feature, location)
+        try:
+            modified = os.path.getmtime(path)
+            if not stale and not self.is_fresh(feature, modified):
+                return None
+            with open(path, 'r') as reader:
+                return reader.read()
+        except FileNotFoundError:
+            return None
+
+    def get_validators(self, feature, location):
+        """Return a dict of the ETag and Last-Modified headers that were
+        stored with the entry, empty when there is no entry or none were
+        stored."""
+        if not os.path.isfile(self.get_path(feature, location)):
+            return {}
+        try:
+            with open(self.get_validators_path(feature, location)) as reader:
+                return json.load(reader)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def put(self, feature, location, text, validators=None):
+        """Atomically write the text as the entry for the feature and
+        location with the dict of HTTP validators, then evict the oldest
+        entries if the cache is too big."""
+        validators_path = self.get_validators_path(feature, location)
+        if validators:
+            self.write(validators_path, json.dumps(validators))
+        else:
+            try:
+                os.unlink(validators_path)
+            except FileNotFoundError:
+                pass
+        self.write(self.get_path(feature, location), text)
+        self.evict()
+
+    def touch(self, feature, location):
+        """Make the entry fresh again, such as when the API answered that the
+        entry has not been modified."""
+        os.utime(self.get_path(feature, location))
+
+    def write(self, path, text):
+        """Write the text to a temporary file and rename it to the path."""
+        handle, temp_path = tempfile.mkstemp(dir=self.directory,
+                                             suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'w') as writer:
+                writer.write(text)
+            os.replace(temp_path, path)
+        except:
+            os.unlink(temp_path)
+            raise
+
+    def evict(self):
+        """Remove the oldest entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        while total > self.max_bytes and entries:
+            modified, size, path = entries.pop(0)
+            for remove in (path, path[:-len('.json')] + '.validators'):
+                try:
+                    os.unlink(remove)
+                except FileNotFoundError:
+                    pass
+            total -= size
+
+
+def get_cache():
+    """Return the shared cache in the default directory."""
+    global _cache
+    if _cache is None:
+        _cache = ForecastCache()
+    return _cache
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""
+weather_changes is Python code to remember what was last rendered for each
+event, so events that have not changed are not rendered and sent again.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+import weather_cache
+import weather_metrics
+
+
+# The JSON file of the digest last sent for each day and location.
+PATH = os.path.join(weather_cache.DIRECTORY, 'changes.json')
+
+
+class ChangeDetector(object):
+    """The digest of the render context and template source last sent for
+    each day and location. New digests are staged with update() and only
+    written by save(), after the event was delivered."""
+
+    def __init__(self, path=PATH, fields=None):
+        """Read the digests that were saved at the path.
+        :param str path: The path of the JSON file of digests.
+        :param list fields: The context keys that trigger a new event, None
+        is any change of the context or the template."""
+        self.path = path
+        self.fields = sorted(fields) if fields else None
+        self.pending = {}
+        self._lock = threading.Lock()
+        self._sources = {}
+        try:
+            with open(path, 'r') as reader:
+                self.digests = json.load(reader)
+        except (FileNotFoundError, ValueError):
+            self.digests = {}
+
+    def get_digest(self, context, template):
+        """Return a stable digest of the context and the source of the
+        template, or of only the trigger fields and the date of the event,
+        so the same weather on another date is a new event."""
+        if self.fields:
+            context = {field: context.get(field)
+                       for field in self.fields + ['event_date']}
+            source = ''
+        else:
+            source = self.get_source_digest(template)
+        text = json.dumps(context, sort_keys=True, default=str)
+        return hashlib.sha256((source + text).encode('utf-8')).hexdigest()
+
+    def get_source_digest(self, template):
+        """Return the digest of the template file, reading the file again
+        only when it was modified."""
+        path = template.filename
+        modified = os.path.getmtime(path)
+        cached = self._sources.get(path)
+        if cached is None or cached[0] != modified:
+            with open(path, 'rb') as reader:
+                cached = (modified, hashlib.sha256(reader.read()).hexdigest())
+            self._sources[path] = cached
+        return cached[1]
+
+    def is_changed(self, day, location, digest):
+        """Return True when the digest is not the last one saved for the day
+        and location."""
+        key = get_key(day, location)
+        changed = self.digests.get(key) != digest
+        if not changed:
+            weather_metrics.METRICS.increment('unchanged')
+        return changed
+
+    def update(self, day, location, digest):
+        """Stage the digest of the event rendered for the day and location."""
+        with self._lock:
+            self.pending[get_key(day, location)] = digest
+
+    def save(self):
+        """Atomically write the staged digests with the saved ones."""
+        with self._lock:
+            if not self.pending:
+                return
+            self.digests.update(self.pending)
+            self.pending = {}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            weather_metrics.write_atomic(self.path, json.dumps(
+                self.digests, indent=2, sort_keys=True))
+
+
+def get_key(day, location):
+    """Return the key of the digests for the day and location."""
+    return '{0} {1}'.format(day.lower(), location)
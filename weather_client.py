@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""
+weather_client is Python code to request weather data over a pooled session.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import concurrent.futures
+import os
+import requests
+import time
+
+from requests.adapters import HTTPAdapter
+
+
+# The scheme and host of the API, such as a local replay_server.py.
+BASE_URL = os.getenv('WEATHER_API', 'http://api.wunderground.com')
+DEADLINE = 30.0  # The total number of seconds to wait for all the features.
+FEATURE_URL = '{0}/api/{1}/{2}/q/{3}.json'
+TIMEOUT = 10.0  # The number of seconds to wait for each request.
+WORKERS = 4  # The number of threads and pooled connections.
+
+_client = None  # The shared client, created on the first get_client() call.
+
+
+class WeatherClient(object):
+    """A client that sends Weather Underground API requests concurrently on
+    a thread pool over one keep-alive requests.Session."""
+
+    def __init__(self, timeout=TIMEOUT, deadline=DEADLINE, workers=WORKERS,
+                 base_url=None):
+        """Create the session and thread pool.
+        :param float timeout: The seconds to wait for each request.
+        :param float deadline: The total seconds to wait for all requests.
+        :param int workers: The number of threads and pooled connections.
+        :param str base_url: The scheme and host of the API, None is the
+        BASE_URL."""
+        self.base_url = (base_url or BASE_URL).rstrip('/')
+        self.timeout = timeout
+        self.deadline = deadline
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = 'gzip'
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.executor = concurrent.futures.ThreadPoolExecutor(workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Stop the thread pool and close the pooled connections."""
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def get_feature(self, key, feature, location, validators=None,
+                    expires=None):
+        """Return the response for one API feature at the location. When
+        there is a dict of the ETag and Last-Modified validators of a cached
+        response the request is conditional and may return 304. When expires
+        is a time.monotonic() value the request waits no longer than that,
+        and is not sent at all when it has passed."""
+        timeout = self.timeout
+        if expires is not None:
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                message = 'The deadline passed before the {0} request.'
+                raise TimeoutError(message.format(feature))
+            timeout = min(timeout, remaining)
+        url = FEATURE_URL.format(self.base_url, key, feature, location)
+        headers = {}
+        if validators:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+        return self.session.get(url, headers=headers, timeout=timeout)
+
+    def fetch(self, key, location, features, validators=None):
+        """Request all the features for the location at the same time and
+        return a dict of feature name to the response or the exception that
+        was raised getting it. The optional validators is a dict of feature
+        name to the validators of the cached response. Features that do not
+        complete before the deadline map to a TimeoutError.
+
+        A running request can not be cancelled, so each request times out at
+        the remaining deadline instead, to free its thread for the next
+        fetch. The timeout applies to each read of the socket, so a server
+        that keeps sending a few bytes can still hold a thread after it."""
+        if validators is None:
+            validators = {}
+        expires = time.monotonic() + self.deadline
+        futures = {}
+        for feature in features:
+            future = self.executor.submit(self.get_feature, key, feature,
+                                          location, validators.get(feature),
+                                          expires)
+            futures[future] = feature
+        done, not_done = concurrent.futures.wait(futures,
+                                                 timeout=self.deadline)
+        results = {}
+        for future in done:
+            feature = futures[future]
+            if future.exception():
+                results[feature] = future.exception()
+            else:
+                results[feature] = future.result()
+        for future in not_done:
+            future.cancel()
+            message = 'The {0} request did not finish in {1} seconds.'
+            results[futures[future]] = TimeoutError(
+                message.format(futures[future], self.deadline))
+        return results
+
+
+def get_client():
+    """Return the shared client so every location scheduled in this process
+    reuses the same connections and threads."""
+    global _client
+    if _client is None:
+        _client = WeatherClient()
+    return _client
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+"""
+weather_daemon is Python code to render scheduled events in a long running
+process.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import datetime
+import heapq
+import itertools
+import os
+import threading
+import traceback
+
+import event_pipeline
+import weather_scheduler
+
+
+MAX_WAIT = 60  # The most seconds to sleep, so clock changes are noticed.
+RUN = '8:00 PM'  # The default time of day to render each job.
+
+
+def get_next_run(run, now):
+    """Return the next datetime after now at the run time of day."""
+    next_run = datetime.datetime.combine(now.date(), run)
+    if next_run <= now:
+        next_run = datetime.datetime.combine(
+            now.date() + datetime.timedelta(days=1), run)
+    return next_run
+
+
+class Daemon(object):
+    """Render the jobs of a manifest every day at the run time of each job,
+    keeping the HTTP session, caches and compiled templates of this process
+    warm between runs. A job is a batch job dict with an optional run key of
+    the time of day in "HH:MM AM|PM" format, and an optional email dict of
+    fromaddress, recipients, subject and image keys to put the rendered event
+    in the email outbox. The outbox is delivered by this process when it has
+    a send function, otherwise by a separate email_outbox.py process."""
+
+    def __init__(self, jobs, key, directory, offline=False, outbox=None,
+                 now=None, metrics=None, prometheus=None, changes=None,
+                 send=None):
+        """Schedule the next run of each job after now.
+        :param list jobs: The job dicts to render.
+        :param str key: The weather underground key.
+        :param str directory: The directory to write the rendered events to.
+        :param bool offline: Render from the cached weather data.
+        :param Outbox outbox: The outbox for jobs with email, None is the
+        default outbox directory.
+        :param str metrics: The path to write the JSON metrics after runs.
+        :param str prometheus: The path to write the Prometheus metrics.
+        :param ChangeDetector changes: Skip the jobs that have not changed
+        since they were last run, None runs every job.
+        :param callable send: The function to deliver the outbox messages
+        with while the daemon runs, such as SMTPPool.send, None leaves them
+        for email_outbox.py."""
+        self.key = key
+        self.changes = changes
+        self.metrics = metrics
+        self.prometheus = prometheus
+        self.directory = directory
+        self.offline = offline
+        self.outbox = outbox
+        self.send = send
+        self.worker = None
+        self.pipeline = event_pipeline.EventPipeline(key, offline=offline,
+                                                     changes=changes)
+        self.heap = []
+        self._counter = itertools.count()
+        self._stop_event = threading.Event()
+        if now is None:
+            now = datetime.datetime.now()
+        for job in jobs:
+            self.schedule(job, now)
+
+    def schedule(self, job, now):
+        """Add the next run of the job after now to the timer heap."""
+        run = datetime.datetime.strptime(job.get('run', RUN),
+                                         '%I:%M %p').time()
+        entry = (get_next_run(run, now), next(self._counter), job)
+        heapq.heappush(self.heap, entry)
+
+    def fire(self, job, now):
+        """Render the job for the next event after now and return the path
+        of the output file, or None when the event has not changed."""
+        context, day, location, start = weather_scheduler.parse_job(job)
+        os.makedirs(self.directory, exist_ok=True)
+        name = job.get('output') or weather_scheduler.get_output_name(
+            day, location, start)
+        settings = job.get('email')
+        if settings and self.pipeline.send is None:
+            self.pipeline.send = self.get_outbox().put
+        # The event is written as it renders and the message is read from
+        # the file, the saved digest is updated after the message is put.
+        path = self.pipeline.run(context, day, location, start, now=now,
+                                 path=os.path.join(self.directory, name),
+                                 email=settings)
+        if settings and self.worker is not None:
+            # Deliver the new message now instead of at the next check.
+            self.worker.wake()
+        return path
+
+    def get_outbox(self):
+        """Return the outbox, the default outbox when none was given."""
+        if self.outbox is None:
+            # Import here so the daemon only loads email when it is needed.
+            import email_outbox
+            self.outbox = email_outbox.Outbox()
+        return self.outbox
+
+    def run_pending(self, now=None):
+        """Fire every job that is due at now, schedule the next run of each
+        and return the number of jobs fired."""
+        if now is None:
+            now = datetime.datetime.now()
+        fired = 0
+        while self.heap and self.heap[0][0] <= now:
+            due, _, job = heapq.heappop(self.heap)
+            try:
+                path = self.fire(job, now)
+                if path is None:
+                    print('The job {0} has not changed'.format(job))
+                else:
+                    print('Wrote {0}'.format(path))
+            except Exception:
+                print('An error occurred running the job {0}'.format(job))
+                print(traceback.print_exc())
+            self.schedule(job, now)
+            fired += 1
+        if fired:
+            weather_scheduler.write_metrics(self.metrics, self.prometheus)
+        return fired
+
+    def run(self):
+        """Fire the jobs when they are due until stop() is called, and
+        deliver the outbox on a thread when the daemon has a send function."""
+        if self.send is not None:
+            import email_outbox
+            self.worker = email_outbox.OutboxWorker(self.get_outbox(),
+                                                    self.send)
+            self.worker.start()
+        try:
+            while not self._stop_event.is_set():
+                self.run_pending()
+                wait = MAX_WAIT
+                if self.heap:
+                    delta = self.heap[0][0] - datetime.datetime.now()
+                    wait = min(wait, max(0, delta.total_seconds()))
+                self._stop_event.wait(wait)
+        except KeyboardInterrupt:
+            print('\n\nUser has quit, stopping the daemon.')
+        finally:
+            if self.worker is not None:
+                self.worker.stop()
+                self.worker.join()
+                self.worker = None
+
+    def stop(self):
+        """Stop running after the current job."""
+        self._stop_event.set()
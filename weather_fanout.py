@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+"""
+weather_fanout is Python code to request the weather for many locations at
+the same time within the API key's quotas.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import concurrent.futures
+import os
+import threading
+import time
+import traceback
+
+import weather_metrics
+import weather_scheduler
+
+
+# The API calls the key may make each minute and each day.
+PER_DAY = int(os.getenv('WEATHER_PER_DAY', 500))
+PER_MINUTE = int(os.getenv('WEATHER_PER_MINUTE', 10))
+WORKERS = 4  # The number of locations to request at the same time.
+
+_limiter = None  # The shared limiter, created on the first get_limiter().
+
+
+class RateLimiter(object):
+    """Token buckets that refill at the per minute and per day quotas. A call
+    takes one token from every bucket, waiting until they all have one."""
+
+    def __init__(self, per_minute=PER_MINUTE, per_day=PER_DAY,
+                 clock=time.monotonic, sleep=time.sleep):
+        """Create full buckets for the quotas, None is no limit.
+        :param int per_minute: The calls allowed in a minute.
+        :param int per_day: The calls allowed in a day.
+        :param function clock: Return the seconds since a fixed point.
+        :param function sleep: Wait for a number of seconds."""
+        self.clock = clock
+        self.sleep = sleep
+        self.buckets = []
+        for calls, seconds in ((per_minute, 60), (per_day, 24 * 60 * 60)):
+            if calls:
+                # The capacity, refill rate per second and current tokens.
+                self.buckets.append([calls, calls / seconds, float(calls)])
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def refill(self):
+        """Add the tokens earned since the last refill, up to capacity."""
+        now = self.clock()
+        elapsed = now - self.updated
+        self.updated = now
+        for bucket in self.buckets:
+            capacity, rate, tokens = bucket
+            bucket[2] = min(capacity, tokens + elapsed * rate)
+
+    def try_acquire(self, tokens=1):
+        """Take the tokens and return 0 when every bucket has them, otherwise
+        return the seconds until they will."""
+        with self._lock:
+            self.refill()
+            wait = 0
+            for capacity, rate, available in self.buckets:
+                if available < tokens:
+                    wait = max(wait, (tokens - available) / rate)
+            if wait == 0:
+                for bucket in self.buckets:
+                    bucket[2] -= tokens
+            return wait
+
+    def acquire(self, tokens=1):
+        """Wait until every bucket has the tokens and take them, returning
+        the seconds spent waiting."""
+        waited = 0
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                if waited:
+                    weather_metrics.METRICS.record('rate_limit', waited)
+                return waited
+            self.sleep(wait)
+            waited += wait
+
+
+class LimitedClient(object):
+    """A weather client that takes a token from the limiter for each API
+    request it makes."""
+
+    def __init__(self, client, limiter):
+        self.client = client
+        self.limiter = limiter
+
+    def fetch(self, key, location, features, validators=None):
+        for _ in features:
+            self.limiter.acquire()
+        return self.client.fetch(key, location, features, validators)
+
+
+def fetch_locations(key, locations, target_date=None, client=None,
+                    cache=None, offline=False, limiter=None,
+                    workers=WORKERS):
+    """Request the weather for each location on a bounded number of threads
+    and yield the location, astronomy data, hourly10day data and error as
+    each one completes. The error is None, or the traceback of getting the
+    weather of that location and the data are None. Requests that are not
+    answered from the cache wait for the limiter, so the quota sets the
+    total time rather than the latency."""
+    if limiter is None:
+        limiter = get_limiter()
+    if client is None and not offline:
+        import weather_client
+        client = weather_client.get_client()
+    if client is not None:
+        client = LimitedClient(client, limiter)
+    locations = list(dict.fromkeys(locations))
+    with concurrent.futures.ThreadPoolExecutor(max(1, workers)) as executor:
+        futures = {}
+        for location in locations:
+            future = executor.submit(weather_scheduler.get_weather, key,
+                                     location, target_date, client=client,
+                                     cache=cache, offline=offline)
+            futures[future] = location
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                astronomy_data, hourly10day_data = future.result()
+            except Exception:
+                # Fail only this location, the others are still yielded.
+                yield futures[future], None, None, traceback.format_exc()
+                continue
+            yield futures[future], astronomy_data, hourly10day_data, None
+
+
+def get_limiter():
+    """Return the shared limiter so all the requests in this process count
+    against the same quotas. The day quota is not remembered between
+    processes."""
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter()
+    return _limiter
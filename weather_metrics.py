@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+
+"""
+weather_metrics is Python code to time the stages of a run and count events.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+PREFIX = 'weather_scheduler'  # The prefix of the Prometheus metric names.
+
+
+class Metrics(object):
+    """The count, total and longest seconds of each stage and the value of
+    each counter since the start of the run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget all the recorded stages and counters."""
+        with self._lock:
+            self.started = time.time()
+            self.stages = {}
+            self.counters = {}
+
+    def record(self, stage, seconds):
+        """Record that one call of the stage took seconds."""
+        with self._lock:
+            count, total, longest = self.stages.get(stage, (0, 0.0, 0.0))
+            self.stages[stage] = (count + 1, total + seconds,
+                                  max(longest, seconds))
+
+    def increment(self, counter, value=1):
+        """Add the value to the counter."""
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    @contextlib.contextmanager
+    def time(self, stage):
+        """Record the seconds the body of the with statement takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def merge(self, summary):
+        """Add the stages and counters of a summary, such as one from another
+        process, to these metrics."""
+        with self._lock:
+            for stage, values in summary['stages'].items():
+                count, total, longest = self.stages.get(stage, (0, 0.0, 0.0))
+                self.stages[stage] = (count + values['count'],
+                                      total + values['seconds'],
+                                      max(longest, values['max_seconds']))
+            for counter, value in summary['counters'].items():
+                self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def summary(self):
+        """Return a dict of the stages and counters that can be JSON."""
+        with self._lock:
+            stages = {stage: {'count': count, 'seconds': total,
+                              'max_seconds': longest}
+                      for stage, (count, total, longest)
+                      in self.stages.items()}
+            return {'started': self.started,
+                    'seconds': time.time() - self.started,
+                    'stages': stages,
+                    'counters': dict(self.counters)}
+
+    def to_prometheus(self, prefix=PREFIX):
+        """Return the stages and counters in the Prometheus text format."""
+        summary = self.summary()
+        lines = []
+
+        def add(name, kind, text, samples):
+            lines.append('# HELP {0}_{1} {2}'.format(prefix, name, text))
+            lines.append('# TYPE {0}_{1} {2}'.format(prefix, name, kind))
+            for labels, value in samples:
+                lines.append('{0}_{1}{2} {3}'.format(prefix, name, labels,
+                                                     value))
+
+        stages = sorted(summary['stages'].items())
+        add('stage_calls_total', 'counter', 'The calls of each stage.',
+            [('{{stage="{0}"}}'.format(stage), values['count'])
+             for stage, values in stages])
+        add('stage_seconds_total', 'counter', 'The seconds in each stage.',
+            [('{{stage="{0}"}}'.format(stage), repr(values['seconds']))
+             for stage, values in stages])
+        add('stage_max_seconds', 'gauge', 'The longest call of each stage.',
+            [('{{stage="{0}"}}'.format(stage), repr(values['max_seconds']))
+             for stage, values in stages])
+        for counter, value in sorted(summary['counters'].items()):
+            add(counter + '_total', 'counter',
+                'The number of {0}.'.format(counter.replace('_', ' ')),
+                [('', value)])
+        add('last_run_timestamp_seconds', 'gauge',
+            'The time the metrics were written.', [('', repr(time.time()))])
+        return '\n'.join(lines) + '\n'
+
+    def write_json(self, path):
+        """Atomically write the JSON summary to the path."""
+        write_atomic(path, json.dumps(self.summary(), indent=2,
+                                      sort_keys=True))
+
+    def write_prometheus(self, path, prefix=PREFIX):
+        """Atomically write the Prometheus text to the path, the file name
+        must end in .prom for the node exporter textfile collector."""
+        write_atomic(path, self.to_prometheus(prefix))
+
+
+def timed(stage):
+    """Return a decorator that records the seconds each call of the function
+    takes as the stage in METRICS."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with METRICS.time(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def write_atomic(path, text):
+    """Write the text to a temporary file and rename it to the path, so
+    readers never see a partial file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'w') as writer:
+            writer.write(text)
+        os.replace(temp_path, path)
+    except:
+        os.unlink(temp_path)
+        raise
+
+
+METRICS = Metrics()  # The metrics of this process.
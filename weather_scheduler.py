@@ -19,31 +19,65 @@ limitations under the License.
 """
 
 import argparse
+import atexit
 import datetime
+import json
 import os
-import requests
 import sys
 import traceback
 
-import email_utilities
+import forecast_parser
+import forecast_table
+import route_catalog
+import single_flight
+import solar_table
+import weather_cache
+import weather_metrics
 
 from datetime import date
 from datetime import time
 from datetime import timedelta
-from jinja2 import Template
 
+# The requests, jinja2 and email modules are imported in the functions that
+# use them, so runs that do not fetch, render or send do not load them.
 
+
+API = 'The scheme and host of the weather API, such as a local ' \
+      'replay_server.py'
+ARCHIVE = 'The directory to append every fetched hourly forecast to'
+# The directory of the forecast archive, None does not archive.
+ARCHIVE_DIRECTORY = os.getenv('WEATHER_ARCHIVE')
+CHANGED_ONLY = 'Only render and send the event when the forecast or the ' \
+               'template changed since it was last sent'
 CONTEXT = 'Additional comma separated key=value pairs to use as context'
+DAEMON = 'Keep running and render the manifest jobs at their run times, ' \
+         'delivering the outbox when --server is given'
 DAY = 'The day of the week to use weather data for: \n' \
       'monday|tuesday|wednesday|thursday|friday|saturday|sunday'
 DEFAULT_LOCATION = 'MN/Rochester'
+DIRECTORY = 'The directory to write the batch output files to'
 DESCRIPTION = 'Request weather forecast data from the Internet and render ' \
               'an event template.'
-DEBUG = False
+# The API features to request and the key each response must contain.
+FEATURES = [('astronomy', 'sun_phase'), ('hourly10day', 'hourly_forecast')]
 KEY = 'The weather underground key to use when making the API requests'
 LOCATION = 'The location to query for the weather forecast'
-NOW = datetime.datetime.now()  # The current date with time.
+METRICS = 'The path of a JSON file to write the run metrics to'
+MANIFEST = 'The path to a JSON list of jobs with day, time, location and ' \
+           'context keys to render in one batch'
+OFFLINE = 'Render from the cached weather data without using the network'
 OUTPUT = 'The path and name of the file to store the output'
+PROCESSES = 'The number of processes to render the manifest jobs on'
+PROMETHEUS = 'The path of a .prom file to write the run metrics to in the ' \
+             'Prometheus text format'
+RENDER_ONLY = 'Only render the event, do not send it in an email'
+# The directory of the compiled template bytecode.
+TEMPLATE_CACHE = os.path.join(weather_cache.DIRECTORY, 'templates')
+# The templates directory next to this file.
+TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'templates')
+TRIGGER = 'Comma separated context keys, such as wind_direction, that ' \
+          'must change to send the event again'
 TIME = 'The time of the event in "HH:MM AM|PM" format'
 URL = 'The url to the image to use for the image of the event. Hint you can ' \
       'use context variables in the url'
@@ -54,50 +88,160 @@ WEEK = {'monday': 0,
         'friday': 4,
         'saturday': 5,
         'sunday': 6}
+# The lowercase day names in the order of datetime.weekday().
+WEEKDAYS = sorted(WEEK, key=WEEK.get)
+
+_archive = None  # The shared archive, see archive_forecast().
+_environment = None  # The shared environment, see get_environment().
 
 
 def command_line():
     """Parse the arguments from the command line."""
+    global ARCHIVE_DIRECTORY
     try:
         parser = argparse.ArgumentParser(description=DESCRIPTION)
+        parser.add_argument('--api',
+                            help='{0} [{1}]'.format(API, None))
+        parser.add_argument('--archive', default=ARCHIVE_DIRECTORY,
+                            help='{0} [{1}]'.format(ARCHIVE,
+                                                    ARCHIVE_DIRECTORY))
+        parser.add_argument('--changed-only', action='store_true',
+                            help='{0} [{1}]'.format(CHANGED_ONLY, False))
         # Arguments required to schedule an event.
         parser.add_argument('-c', '--context',
                             help='{0} [{1}]'.format(CONTEXT, None))
         parser.add_argument('-d', '--day', default='monday',
                             help='{0} [{1}]'.format(DAY, 'monday'))
+        parser.add_argument('--daemon', action='store_true',
+                            help='{0} [{1}]'.format(DAEMON, False))
         parser.add_argument('-k', '--key',
                             help='{0} [{1}]'.format(KEY, None))
         parser.add_argument('-l', '--location', default=DEFAULT_LOCATION,
                             help='{0} [{1}]'.format(LOCATION, None))
+        parser.add_argument('-m', '--manifest',
+                            help='{0} [{1}]'.format(MANIFEST, None))
+        parser.add_argument('--metrics',
+                            help='{0} [{1}]'.format(METRICS, None))
+        parser.add_argument('--directory', default='output',
+                            help='{0} [{1}]'.format(DIRECTORY, 'output'))
         parser.add_argument('-o', '--output',
                             help='{0} [{1}]'.format(OUTPUT, None))
+        parser.add_argument('--offline', action='store_true',
+                            help='{0} [{1}]'.format(OFFLINE, False))
+        parser.add_argument('--processes', type=int,
+                            help='{0} [{1}]'.format(PROCESSES, None))
+        parser.add_argument('--prometheus',
+                            help='{0} [{1}]'.format(PROMETHEUS, None))
+        parser.add_argument('--render-only', action='store_true',
+                            help='{0} [{1}]'.format(RENDER_ONLY, False))
         parser.add_argument('-t', '--time', default='6:00 PM',
                             help='{0} [{1}]'.format(TIME, '6:00 PM'))
+        parser.add_argument('--trigger',
+                            help='{0} [{1}]'.format(TRIGGER, None))
         arguments, extra = parser.parse_known_args()
 
         key = arguments.key
-        if not key:
+        if not key and not arguments.offline:
             key = os.getenv('KEY')
             if not key:
                 key = prompt(KEY + ': ')
 
+        if arguments.archive:
+            ARCHIVE_DIRECTORY = arguments.archive
+
+        if arguments.api:
+            import weather_client
+            weather_client.BASE_URL = arguments.api
+
+        changes = None
+        if arguments.changed_only or arguments.trigger:
+            import weather_changes
+            fields = None
+            if arguments.trigger:
+                fields = [field.strip()
+                          for field in arguments.trigger.split(',')]
+            changes = weather_changes.ChangeDetector(fields=fields)
+
+        if arguments.metrics or arguments.prometheus:
+            # Write the metrics when the program exits, even on an error.
+            atexit.register(write_metrics, arguments.metrics,
+                            arguments.prometheus)
+
+        if arguments.daemon:
+            # Import here because weather_daemon imports this module.
+            import weather_daemon
+            jobs = read_manifest(arguments.manifest)
+            daemon = weather_daemon.Daemon(jobs, key, arguments.directory,
+                                           offline=arguments.offline,
+                                           metrics=arguments.metrics,
+                                           prometheus=arguments.prometheus,
+                                           changes=changes)
+            import email_utilities
+            # The arguments this parser did not know are the email ones.
+            email_arguments = email_utilities.parse_arguments(extra)
+            if not email_arguments.server:
+                # A separate email_outbox.py process delivers the outbox.
+                daemon.run()
+                return
+            with email_utilities.SMTPPool(
+                    email_arguments.server, email_arguments.port,
+                    email_arguments.username,
+                    email_utilities.get_password(email_arguments)) as pool:
+                daemon.send = pool.send
+                daemon.run()
+            return
+
+        if arguments.manifest:
+            # Render every job in the manifest without sending email.
+            jobs = read_manifest(arguments.manifest)
+            if arguments.processes:
+                # Import here because weather_shards imports this module.
+                import weather_shards
+                results = weather_shards.run_shards(
+                    jobs, key, arguments.directory,
+                    offline=arguments.offline,
+                    processes=arguments.processes)
+            else:
+                results = schedule_batch(jobs, key, arguments.directory,
+                                         offline=arguments.offline)
+            failures = []
+            for index, path, error in results:
+                if error:
+                    failures.append((index, error))
+                else:
+                    print('Wrote {0}'.format(path))
+            for index, error in sorted(failures):
+                print('Job {0} failed: {1}'.format(index, error))
+            if failures:
+                message = '{0} of {1} jobs failed.'
+                raise ValueError(message.format(len(failures), len(jobs)))
+            return
+
         # Parse the time HH:MM AM|PM from the command line.
         start = datetime.datetime.strptime(arguments.time, '%I:%M %p').time()
-        event_text = schedule_event(split_kv_string(arguments.context),
-                                    arguments.day,
-                                    key,
-                                    arguments.location,
-                                    start)
-        if arguments.output:
-            with open(arguments.output, 'w') as writer:
-                writer.write(event_text)
-        else:
-            print(event_text)
-
-        # TODO Output an image path and send to second step
-        sys.argv.append('--text')
-        sys.argv.append(event_text)
-        email_utilities.command_line()
+        # Import here because event_pipeline imports this module.
+        import event_pipeline
+        pipeline = event_pipeline.EventPipeline(key,
+                                                offline=arguments.offline,
+                                                changes=changes)
+        email = None
+        if not arguments.render_only:
+            import email_utilities
+            # The arguments this parser did not know are the email ones.
+            email_arguments = email_utilities.parse_arguments(extra)
+            pipeline.send = email_utilities.get_sender(email_arguments)
+            email = vars(email_arguments)
+        event = pipeline.run(split_kv_string(arguments.context),
+                             arguments.day,
+                             arguments.location,
+                             start,
+                             path=arguments.output,
+                             email=email)
+        if event is None:
+            print('The {0} event for {1} has not changed.'.format(
+                arguments.day, arguments.location))
+        elif not arguments.output:
+            print(event)
 
     except:
         print('An exception occurred parsing the command-line arguments.')
@@ -122,16 +266,28 @@ def interactive():
                                     options['location'],
                                     options['time'])
         print(event_text)
+        import email_utilities
         email_utilities.interactive(text=event_text)
     except (KeyboardInterrupt, SystemExit) as e:
         print('\n\nUser has quit, exiting program.')
         exit(2)
 
 
+def write_metrics(json_path=None, prometheus_path=None):
+    """Write the metrics of this process to the JSON file and the Prometheus
+    text file at the paths that are not None."""
+    if json_path:
+        weather_metrics.METRICS.write_json(json_path)
+    if prometheus_path:
+        weather_metrics.METRICS.write_prometheus(prometheus_path)
+
+
 def split_kv_string(string):
     """Split the string on commas and then split the remaining elements on
     equal sign to create a dict of key and value pairs."""
     dictionary = {}
+    if not string:
+        return dictionary
     # Are there any commas in the string?
     if ',' in string:
         array = string.split(',')  # Split on commas first.
@@ -153,21 +309,40 @@ def prompt(message, default=None):
         return input('{0}: '.format(message))
 
 
-def get_datetime(day, time):
-    """Return a date object for the specified english weekday day and time."""
+def archive_forecast(location, text):
+    """Append the hourly forecast text of the location to the archive in the
+    ARCHIVE_DIRECTORY."""
+    global _archive
+    try:
+        import forecast_archive
+        if _archive is None or _archive.directory != ARCHIVE_DIRECTORY:
+            _archive = forecast_archive.ForecastArchive(ARCHIVE_DIRECTORY)
+        data = get_feature_data(text, 'hourly10day', 'hourly_forecast')
+        _archive.append(location, forecast_table.ForecastTable(data))
+    except:
+        print('An error occurred archiving the forecast for {0}.'.format(
+            location))
+        print(traceback.print_exc())
+
+
+def get_datetime(day, time, now=None):
+    """Return a date object for the specified english weekday day and time
+    that is next after now, or the current date and time when None."""
+    if now is None:
+        now = datetime.datetime.now()
     # Normalize the english day to lower case.
     day = day.lower()
     # Get the target weekday number.
     day_weekday = WEEK[day]
 
     # Get today's date.
-    today = datetime.date.today()
+    today = now.date()
     # Get today's weekday number.
-    today_weekday = NOW.weekday()
+    today_weekday = now.weekday()
 
     target = None
     # The target day is today if days match and it is before the target time.
-    if day_weekday == today_weekday and NOW.time() < time:
+    if day_weekday == today_weekday and now.time() < time:
         target = today
     elif day_weekday > today_weekday:
         # The target date is still this week, increment to that day.
@@ -180,69 +355,206 @@ def get_datetime(day, time):
     return datetime.datetime.combine(target, time)
 
 
+def get_environment():
+    """Return the shared jinja2 environment that keeps compiled templates in
+    memory until the file changes, and on disk between processes."""
+    global _environment
+    if _environment is None:
+        from jinja2 import Environment
+        from jinja2 import FileSystemBytecodeCache
+        from jinja2 import FileSystemLoader
+        os.makedirs(TEMPLATE_CACHE, exist_ok=True)
+        # Look in the current directory first, then next to this file.
+        loader = FileSystemLoader(['templates', TEMPLATES])
+        _environment = Environment(
+            loader=loader,
+            auto_reload=True,
+            bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE))
+    return _environment
+
+
 def get_template(day):
-    """Get template for the specified day by name, an exception is thrown
-    if the file does not exist for the day specified."""
-    template_file = 'templates/{0}.html.j2'.format(day.lower())
-    with open(template_file, 'r') as template_data:
-        template_string = template_data.read()
-    return template_string
+    """Get the compiled template for the specified day by name, an exception
+    is thrown if the file does not exist for the day specified."""
+    template_file = '{0}.html.j2'.format(day.lower())
+    return get_environment().get_template(template_file)
 
 
-def get_weather(key, location, target_date):
-    """Return the forcast and astronomy data using the Weather Underground
-    API key, location and target date."""
-    astronomy_url = 'http://api.wunderground.com/api/{0}/astronomy/q/{1}.json'
-    astronomy_data = {}
-    try:
-        # Get the astronomy data for the location.
-        response = requests.get(astronomy_url.format(key, location))
-        if response.status_code != 200:
-            message = 'The HTTP response code was not OK for {0}'
-            raise ValueError(message.format(astronomy_url))
-        if DEBUG:
-            date = NOW.strftime('%Y-%m-%d')
-            file_name = 'examples/{0}-astronomy.json'.format(date)
-            with open(file_name, 'w') as fw:
-                print('Writing {0}'.format(file_name))
-                fw.write(response.text)
-        if 'sun_phase' in response.json():
-            astronomy_data = response.json()
-        else:
-            raise ValueError('The astronomy data does not contain sun_phase!')
-    except:
-        print('An error occurred getting astronomy data.')
-        print(traceback.print_exc())
+def get_validators(response):
+    """Return a dict of the ETag and Last-Modified headers of the response to
+    store with the cached text for conditional requests."""
+    validators = {}
+    if response.headers.get('ETag'):
+        validators['etag'] = response.headers['ETag']
+    if response.headers.get('Last-Modified'):
+        validators['last_modified'] = response.headers['Last-Modified']
+    return validators
 
-    hourly10_url = 'http://api.wunderground.com/api/{0}/hourly10day/q/{1}.json'
-    hourly10day_data = {}
-    try:
-        response = requests.get(hourly10_url.format(key, location))
-        if response.status_code != 200:
-            message = 'The HTTP response code was not OK for {0}'
-            raise ValueError(message.format(hourly10_url))
-        if DEBUG:
-            date = NOW.strftime('%Y-%m-%d')
-            file_name = 'examples/{0}-hourly10day.json'.format(date)
-            with open(file_name, 'w') as fw:
-                print('Writing {0}'.format(file_name))
-                fw.write(response.text)
-        if 'hourly_forecast' in response.json():
-            hourly10day_data = response.json()
-        else:
-            raise ValueError('Hourly data does not contain hourly_forecast!')
-    except:
-        print('An error occurred getting the hourly10day data.')
-        print(traceback.print_exc())
 
-    return astronomy_data, hourly10day_data
+def get_weather(key, location, target_date, client=None, cache=None,
+                offline=False, until=None):
+    """Return the forcast and astronomy data using the Weather Underground
+    API key, location and target date. The astronomy data is a SunTable for
+    locations with known coordinates. Fresh data is read from the cache and
+    the remaining features are requested at the same time using the client.
+    When offline is True all the data comes from the cache even if stale.
+    When until is a datetime the hourly data stops after that hour. Threads
+    asking for the same location at the same time share the requests and
+    the decoded data."""
+    if cache is None:
+        cache = weather_cache.get_cache()
+    metrics = weather_metrics.METRICS
+    results = {}
+    features = FEATURES
+    # The sun is computed for the locations with known coordinates.
+    sun_table = solar_table.get_table(location)
+    if sun_table is not None:
+        results['astronomy'] = sun_table
+        features = [(feature, required) for feature, required in FEATURES
+                    if feature != 'astronomy']
+    texts = {}
+    for feature, required in features:
+        texts[feature] = cache.get(feature, location, stale=offline)
+    missing = [feature for feature, _ in features if texts[feature] is None]
+    metrics.increment('cache_hits', len(features) - len(missing))
+    metrics.increment('cache_misses', len(missing))
+    responses = {}
+    calls = {}
+    leading = []
+    if missing and not offline:
+        # Wait for the requests another thread already has in flight for
+        # this location instead of sending them again.
+        for feature in missing:
+            calls[feature], leader = single_flight.FLIGHTS.begin(
+                ('fetch', feature, location))
+            if leader:
+                leading.append(feature)
+    if leading:
+        try:
+            if client is None:
+                import weather_client
+                client = weather_client.get_client()
+            # Expired entries are requested only if they changed since cached.
+            validators = {feature: cache.get_validators(feature, location)
+                          for feature in leading}
+            with metrics.time('fetch'):
+                responses = client.fetch(key, location, leading, validators)
+        except Exception as error:
+            # The waiting threads must get an answer even when this fails.
+            responses = {feature: error for feature in leading}
+
+    for feature, required in features:
+        data = {}
+        try:
+            text = texts[feature]
+            response = None
+            if text is None:
+                if offline:
+                    message = 'The {0} data for {1} is not in the cache.'
+                    raise ValueError(message.format(feature, location))
+                if feature in leading:
+                    response = responses[feature]
+                    text = single_flight.FLIGHTS.complete(
+                        calls[feature], get_fetched_text, response, feature,
+                        location, cache)
+                else:
+                    text = calls[feature].wait()
+            with metrics.time('decode'):
+                # Threads with the same text share one decode of it.
+                data = single_flight.FLIGHTS.do(
+                    ('decode', feature, until, text), get_feature_data, text,
+                    feature, required, until)
+            if response is not None:
+                cache_response(response, feature, location, text, cache)
+        except:
+            print('An error occurred getting the {0} data.'.format(feature))
+            print(traceback.print_exc())
+        results[feature] = data
+
+    return results['astronomy'], results['hourly10day']
+
+
+def cache_response(response, feature, location, text, cache):
+    """Store the text of a response that was decoded without an error in the
+    cache, and in the archive when it is an hourly forecast."""
+    if response.status_code == 304:
+        cache.touch(feature, location)
+    else:
+        cache.put(feature, location, text, get_validators(response))
+        if ARCHIVE_DIRECTORY and feature == 'hourly10day':
+            archive_forecast(location, text)
+
+
+def get_fetched_text(response, feature, location, cache):
+    """Return the text of the response for an API feature, or the cached text
+    when the API answered that it has not been modified."""
+    if getattr(response, 'status_code', None) == 304:
+        # The API has not changed the expired entry, reuse it.
+        weather_metrics.METRICS.increment('not_modified')
+        text = cache.get(feature, location, stale=True)
+        if text is None:
+            message = 'The {0} data for {1} was evicted.'
+            raise ValueError(message.format(feature, location))
+        return text
+    return get_response_text(response, feature)
+
+
+def get_response_text(response, feature):
+    """Return the text of the response for an API feature, raise an exception
+    if the request failed."""
+    if isinstance(response, Exception):
+        raise response
+    if response.status_code != 200:
+        message = 'The HTTP response code was not OK for {0}'
+        raise ValueError(message.format(response.url))
+    # The Content-Length is the size on the wire when it was compressed.
+    length = response.headers.get('Content-Length')
+    weather_metrics.METRICS.increment('bytes_downloaded',
+                                      int(length) if length
+                                      else len(response.content))
+    return response.text
+
+
+def get_feature_data(text, feature, required, until=None):
+    """Return the decoded JSON text of an API feature, raise an exception if
+    the data is missing the required key."""
+    if feature == 'hourly10day':
+        # Keep only the fields that are used, stopping after the until hour.
+        return forecast_parser.decode_hourly10day(text, until)
+    data = json.loads(text)
+    if required not in data:
+        message = 'The {0} data does not contain {1}!'
+        raise ValueError(message.format(feature, required))
+    return data
+
+
+def update_routes(context, target_datetime):
+    """Update the context with the rows of the routes from the start point
+    of the day for the wind direction. A start context key replaces the
+    start point of the day, and an average_speed key in mph leaves out the
+    routes that are too long to ride before sunset."""
+    catalog = route_catalog.get_catalog()
+    day = WEEKDAYS[target_datetime.weekday()]
+    start = context.get('start') or catalog.get_start(day)
+    max_miles = None
+    if context.get('average_speed') and context.get('daylight_in_hours'):
+        max_miles = float(context['average_speed']) * \
+            context['daylight_in_hours']
+    context['routes'] = catalog.get_rows(start, context.get('wind_direction'),
+                                         max_miles)
+    return context
 
 
+@weather_metrics.timed('context')
 def update_context(context, target_datetime, astronomy_data, hourly10day_data):
     """Update context with the weather data for the target date and time."""
     context['event_time'] = target_datetime.time().strftime('%l:%M %p')
     context['event_date'] = target_datetime.strftime('%B %d, %Y')
     context['event_day'] = target_datetime.strftime('%A')
+    if isinstance(astronomy_data, solar_table.SunTable):
+        # Use the computed sun of the target date.
+        astronomy_data = astronomy_data.get_astronomy_data(
+            target_datetime.date())
     # Create a time object with the sunset hour and minute.
     sunset = time(int(astronomy_data['sun_phase']['sunset']['hour']),
                   int(astronomy_data['sun_phase']['sunset']['minute']))
@@ -262,68 +574,204 @@ def update_context(context, target_datetime, astronomy_data, hourly10day_data):
         context['daylight_in_minutes'] = 0
         context['daylight_in_hours'] = 0
 
-    # Iterate over the entire hourly_forcast array.
-    for a in range(0, len(hourly10day_data['hourly_forecast'])):
-        forecast = hourly10day_data['hourly_forecast'][a]
-        forecast_time = forecast['FCTTIME']
-        # Use the record that matches the day and hour.
-        if forecast_time['mday'] == str(target_datetime.day) and \
-           forecast_time['hour'] == str(target_datetime.hour):
-            # Get the values for this matching time and day.
-            context['condition'] = forecast['condition']
-            context['dewpoint_english'] = forecast['dewpoint']['english']
-            context['dewpoint_metric'] = forecast['dewpoint']['metric']
-            context['feelslike_english'] = forecast['feelslike']['english']
-            context['feelslike_metric'] = forecast['feelslike']['metric']
-            context['forecast_time_date'] = forecast_time['pretty']
-            context['heatindex_english'] = forecast['heatindex']['english']
-            context['heatindex_metric'] = forecast['heatindex']['metric']
-            context['humidity'] = forecast['humidity']
-            # mslp = mean sea-level pressure, the barometric pressure reduced
-            # to sea level.
-            context['mean_sea_level_pressure'] = forecast['mslp']
-            # Sky is the percent of cloud cover 100 is cloudy, 50 is partially.
-            context['percent_cloud_cover'] = forecast['sky']
-            # POP stands for Probability of Precipitation. Probability of
-            # precipitation refers to the percent chance that a specific
-            # location will receive measurable precipitation.
-            context['probability_of_precipitation'] = forecast['pop']
-            # qpf = Quantitative precipitation forecast.
-            context['quantitative_precipitation'] = forecast['qpf']
-            context['snow_english'] = forecast['snow']['english']
-            context['snow_metric'] = forecast['snow']['metric']
-            context['temperature_english'] = forecast['temp']['english']
-            context['temperature_metric'] = forecast['temp']['metric']
-            context['ultraviolet_index'] = forecast['uvi']
-            # wx is the weather condition.
-            context['weather_condition'] = forecast['wx']
-            context['wind_speed_english'] = forecast['wspd']['english']
-            context['wind_speed_metric'] = forecast['wspd']['metric']
-            context['wind_direction'] = forecast['wdir']['dir']
-            context['wind_degrees'] = forecast['wdir']['degrees']
-            context['windchill_english'] = forecast['windchill']['english']
-            context['windchill_metric'] = forecast['windchill']['metric']
-            break
+    # Look up the row that matches the day and hour, a ForecastTable is only
+    # worth building when it is used for more than one event.
+    if isinstance(hourly10day_data, forecast_table.ForecastTable):
+        row = hourly10day_data.get(target_datetime)
+    else:
+        row = forecast_table.find_row(hourly10day_data, target_datetime)
+    if row:
+        # Get the values for this matching time and day.
+        context['condition'] = row.condition
+        context['dewpoint_english'] = row.text('dewpoint_english')
+        context['dewpoint_metric'] = row.text('dewpoint_metric')
+        context['feelslike_english'] = row.text('feelslike_english')
+        context['feelslike_metric'] = row.text('feelslike_metric')
+        context['forecast_time_date'] = row.pretty
+        context['heatindex_english'] = row.text('heatindex_english')
+        context['heatindex_metric'] = row.text('heatindex_metric')
+        context['humidity'] = row.text('humidity')
+        # mslp = mean sea-level pressure, the barometric pressure reduced
+        # to sea level.
+        context['mean_sea_level_pressure'] = {
+            'english': row.text('mslp_english'),
+            'metric': row.text('mslp_metric')}
+        # Sky is the percent of cloud cover 100 is cloudy, 50 is partially.
+        context['percent_cloud_cover'] = row.text('sky')
+        # POP stands for Probability of Precipitation. Probability of
+        # precipitation refers to the percent chance that a specific
+        # location will receive measurable precipitation.
+        context['probability_of_precipitation'] = row.text('pop')
+        # qpf = Quantitative precipitation forecast.
+        context['quantitative_precipitation'] = {
+            'english': row.text('qpf_english'),
+            'metric': row.text('qpf_metric')}
+        context['snow_english'] = row.text('snow_english')
+        context['snow_metric'] = row.text('snow_metric')
+        context['temperature_english'] = row.text('temp_english')
+        context['temperature_metric'] = row.text('temp_metric')
+        context['ultraviolet_index'] = row.text('uvi')
+        # wx is the weather condition.
+        context['weather_condition'] = row.wx
+        context['wind_speed_english'] = row.text('wspd_english')
+        context['wind_speed_metric'] = row.text('wspd_metric')
+        context['wind_direction'] = row.wdir_dir
+        context['wind_degrees'] = row.text('wdir_degrees')
+        context['windchill_english'] = row.text('windchill_english')
+        context['windchill_metric'] = row.text('windchill_metric')
 
     return context
 
 
-def schedule_event(context, day, key, location, time):
-    """Use the key to retrieve the weather information for the specified day
-    and return the appropriate template using the context."""
-    # Get the datetime object for the target day and time.
-    target = get_datetime(day, time)
-    # Call the Weather Underground API to get the JSON data for the date.
-    astronomy_data, hourly10day_data = get_weather(key, location, target)
-    # Read the template based on day name, and return as a string.
-    template_string = get_template(day)
-    # Create the jinja2 object that will replace the variables in the template.
-    template = Template(template_string)
+def read_manifest(path):
+    """Read the JSON list of jobs from the manifest file at the path."""
+    with open(path, 'r') as reader:
+        return json.load(reader)
+
+
+def get_output_name(day, location, start):
+    """Return the file name for the output of a day, location and start
+    time, so the events of a day at different times do not share a file."""
+    return '{0}-{1}-{2:%H%M}.html'.format(location.replace('/', '_'),
+                                          day.lower(), start)
+
+
+def get_duplicates(names):
+    """Return a dict of the index of each output name that an earlier job
+    already writes to, to the error message of it. None names are skipped."""
+    first = {}
+    duplicates = {}
+    for index, name in enumerate(names):
+        if name is None:
+            continue
+        if name in first:
+            message = 'The output {0} is already written by job {1}.'
+            duplicates[index] = message.format(name, first[name])
+        else:
+            first[name] = index
+    return duplicates
+
+
+def get_event_context(context, target, location, astronomy_data,
+                      hourly10day_data):
+    """Return the context updated with the location, the weather data for
+    the target datetime and the routes for the wind direction."""
     # Update the context with the target date and API data.
     context = update_context(context, target, astronomy_data, hourly10day_data)
     context['location'] = location
+    update_routes(context, target)
+    return context
+
+
+def render_event(template, context, target, location, astronomy_data,
+                 hourly10day_data):
+    """Update the context with the weather data for the target datetime and
+    return the rendered template."""
+    context = get_event_context(context, target, location, astronomy_data,
+                                hourly10day_data)
+    # Replace the template variables with the context values.
+    with weather_metrics.METRICS.time('render'):
+        return template.render(context)
+
+
+def parse_job(job):
+    """Return the context, day, location and start time of a job dict with
+    day, time, location and context keys."""
+    day = job.get('day', 'monday').lower()
+    location = job.get('location', DEFAULT_LOCATION)
+    start = datetime.datetime.strptime(job.get('time', '6:00 PM'),
+                                       '%I:%M %p').time()
+    context = job.get('context') or {}
+    if isinstance(context, dict):
+        context = dict(context)
+    else:
+        context = split_kv_string(context)
+    return context, day, location, start
+
+
+def schedule_batch(jobs, key, directory, client=None, offline=False):
+    """Render each job dict of day, time, location, context and optional
+    output keys to a file in the directory, and return a list of the
+    (index, path, error) of each job. The error is None when the path was
+    written, otherwise the path is None. The weather is requested once per
+    location, for all the locations at the same time."""
+    # Import here because weather_fanout imports this module.
+    import weather_fanout
+    os.makedirs(directory, exist_ok=True)
+    parsed = [parse_job(job) for job in jobs]
+    names = [job.get('output') or get_output_name(day, location, start)
+             for job, (_, day, location, start) in zip(jobs, parsed)]
+    # Fail the later jobs that would overwrite the file of an earlier one.
+    duplicates = get_duplicates(names)
+    locations = [location for _, _, location, _ in parsed]
+    # Compute the sun of every location for the years of the jobs at once.
+    for year in set(get_datetime(day, start).year
+                    for _, day, _, start in parsed):
+        solar_table.get_tables(locations, year)
+    weather = {}
+    errors = {}
+    responses = weather_fanout.fetch_locations(key, locations, client=client,
+                                               offline=offline)
+    for location, astronomy_data, hourly10day_data, error in responses:
+        if error is None and not (astronomy_data and hourly10day_data):
+            # The errors getting the weather were already printed.
+            error = 'The weather for {0} is not available.'.format(location)
+        if error is None:
+            try:
+                # Store the hourly data once for all the jobs at this location.
+                table = forecast_table.ForecastTable(hourly10day_data)
+            except Exception:
+                error = traceback.format_exc()
+        if error is not None:
+            # The weather of this location is missing, fail only its jobs.
+            errors[location] = error
+            continue
+        weather[location] = (astronomy_data, table)
+    results = []
+    for index, (name, (context, day, location, start)) in \
+            enumerate(zip(names, parsed)):
+        if index in duplicates:
+            results.append((index, None, duplicates[index]))
+            continue
+        if location in errors:
+            results.append((index, None, errors[location]))
+            continue
+        try:
+            target = get_datetime(day, start)
+            astronomy_data, hourly10day_data = weather[location]
+            event_text = render_event(get_template(day), context, target,
+                                      location, astronomy_data,
+                                      hourly10day_data)
+            path = os.path.join(directory, name)
+            with open(path, 'w') as writer:
+                writer.write(event_text)
+            results.append((index, path, None))
+        except Exception:
+            results.append((index, None, traceback.format_exc()))
+    return results
+
+
+@weather_metrics.timed('schedule_event')
+def schedule_event(context, day, key, location, time, client=None,
+                   offline=False, now=None, cache=None, changes=None):
+    """Use the key to retrieve the weather information for the specified day
+    and return the appropriate template using the context. When changes is a
+    ChangeDetector and the event has not changed since it was last saved,
+    return None without rendering the template. The digest of the event is
+    not staged, EventPipeline.run remembers the event after delivering it."""
+    # Import here because event_pipeline imports this module.
+    import event_pipeline
+    pipeline = event_pipeline.EventPipeline(key, client, cache, offline,
+                                            changes)
+    # Get the datetime object for the target day and time.
+    target = get_datetime(day, time, now)
+    # Call the Weather Underground API to get the JSON data for the date.
+    weather = pipeline.fetch(location, target)
+    context = pipeline.context(context, target, location, weather)
+    if not pipeline.is_changed(day, location, context):
+        return None
     # Replace the template variables with the context values.
-    return template.render(context)
+    return pipeline.render(day, context)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+"""
+weather_shards is Python code to render a large manifest of jobs on several
+processes, in shards of the jobs of each location.
+
+Copyright 2016 Matthew Bruzek
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import concurrent.futures
+import hashlib
+import multiprocessing
+import os
+import traceback
+
+import forecast_table
+import solar_table
+import weather_cache
+import weather_fanout
+import weather_metrics
+import weather_scheduler
+
+
+PROCESSES = os.cpu_count() or 1  # The number of processes to render on.
+
+# The location to the digest of the texts, astronomy data and ForecastTable
+# last decoded in this process, so a worker decodes each forecast once.
+_weather = {}
+
+
+def fetch_texts(key, location, client, cache, offline=False):
+    """Return a dict of feature to the text of the location from the cache
+    or the client, and a dict of feature to the response of the features
+    that were requested. The texts are not decoded."""
+    metrics = weather_metrics.METRICS
+    features = [feature for feature, _ in weather_scheduler.FEATURES
+                if feature != 'astronomy' or
+                solar_table.get_coordinates(location) is None]
+    texts = {}
+    for feature in features:
+        texts[feature] = cache.get(feature, location, stale=offline)
+    missing = [feature for feature in features if texts[feature] is None]
+    metrics.increment('cache_hits', len(features) - len(missing))
+    metrics.increment('cache_misses', len(missing))
+    responses = {}
+    if missing:
+        if offline:
+            message = 'The {0} data for {1} is not in the cache.'
+            raise ValueError(message.format(', '.join(missing), location))
+        validators = {feature: cache.get_validators(feature, location)
+                      for feature in missing}
+        with metrics.time('fetch'):
+            responses = client.fetch(key, location, missing, validators)
+        for feature in missing:
+            texts[feature] = weather_scheduler.get_fetched_text(
+                responses[feature], feature, location, cache)
+    return texts, responses
+
+
+def get_weather(location, texts):
+    """Return the astronomy data and ForecastTable of the texts, decoding
+    them only when this process has not already decoded the same texts."""
+    digest = hashlib.sha1()
+    for feature in sorted(texts):
+        digest.update(texts[feature].encode('utf-8'))
+    digest = digest.hexdigest()
+    cached = _weather.get(location)
+    if cached is not None and cached[0] == digest:
+        return cached[1], cached[2]
+    required = dict(weather_scheduler.FEATURES)
+    with weather_metrics.METRICS.time('decode'):
+        astronomy_data = solar_table.get_table(location)
+        if astronomy_data is None:
+            astronomy_data = weather_scheduler.get_feature_data(
+                texts['astronomy'], 'astronomy', required['astronomy'])
+        hourly10day_data = weather_scheduler.get_feature_data(
+            texts['hourly10day'], 'hourly10day', required['hourly10day'])
+        table = forecast_table.ForecastTable(hourly10day_data)
+    _weather[location] = (digest, astronomy_data, table)
+    return astronomy_data, table
+
+
+def render_shard(location, texts, jobs, directory):
+    """Decode the texts of the location and render the list of (index, job)
+    to files in the directory. Return the location, True when the texts were
+    decoded, a list of (index, path, error) of each job and the summary of
+    the metrics of this shard. This runs in the worker processes."""
+    metrics = weather_metrics.METRICS
+    # Each shard reports only its own metrics to the parent process.
+    metrics.reset()
+    try:
+        astronomy_data, table = get_weather(location, texts)
+    except Exception:
+        error = traceback.format_exc()
+        return (location, False, [(index, None, error) for index, _ in jobs],
+                metrics.summary())
+    results = []
+    for index, job in jobs:
+        try:
+            context, day, _, start = weather_scheduler.parse_job(job)
+            target = weather_scheduler.get_datetime(day, start)
+            template = weather_scheduler.get_template(day)
+            event_text = weather_scheduler.render_event(
+                template, context, target, location, astronomy_data, table)
+            name = job.get('output') or \
+                weather_scheduler.get_output_name(day, location, start)
+            path = os.path.join(directory, name)
+            with open(path, 'w') as writer:
+                writer.write(event_text)
+            results.append((index, path, None))
+        except Exception:
+            results.append((index, None, traceback.format_exc()))
+    return location, True, results, metrics.summary()
+
+
+def run_shards(jobs, key, directory, client=None, cache=None, offline=False,
+               processes=PROCESSES, limiter=None):
+    """Render each job dict of day, time, location, context and optional
+    output keys to a file in the directory on a pool of processes, and yield
+    the (index, path, error) of each job as its shard finishes. The error is
+    None when the path was written, otherwise the path is None.
+
+    The weather is requested in this process on a few threads, within the
+    quota of the limiter, and each location is sent to the processes as soon
+    as its texts arrive. The jobs of a location are split in up to processes
+    shards, and the processes decode the texts and render the jobs of their
+    shard. Responses are only cached after they were decoded."""
+    os.makedirs(directory, exist_ok=True)
+    processes = max(1, processes)
+    if cache is None:
+        cache = weather_cache.get_cache()
+    if client is None and not offline:
+        import weather_client
+        client = weather_client.get_client()
+    if client is not None:
+        client = weather_fanout.LimitedClient(
+            client, limiter or weather_fanout.get_limiter())
+    # Fail the later jobs that would overwrite the file of an earlier one
+    # here, as the shards of a location finish in any order.
+    duplicates = weather_scheduler.get_duplicates(
+        [get_output_name(job) for job in jobs])
+    locations = {}
+    for index, job in enumerate(jobs):
+        if index in duplicates:
+            yield index, None, duplicates[index]
+            continue
+        location = job.get('location', weather_scheduler.DEFAULT_LOCATION)
+        locations.setdefault(location, []).append((index, job))
+    # New processes instead of forks of this process, where the fetch
+    # threads could be holding a lock.
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ThreadPoolExecutor(
+            weather_fanout.WORKERS) as fetcher, \
+            concurrent.futures.ProcessPoolExecutor(
+                processes, mp_context=context) as renderer:
+        fetches = {}
+        for location in locations:
+            future = fetcher.submit(fetch_texts, key, location, client, cache,
+                                    offline)
+            fetches[future] = location
+        renders = {}
+        cached = set()
+        pending = set(fetches)
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future in fetches:
+                    location = fetches[future]
+                    try:
+                        texts, responses = future.result()
+                    except Exception:
+                        error = traceback.format_exc()
+                        for index, _ in locations[location]:
+                            yield index, None, error
+                        continue
+                    for shard in split_jobs(locations[location], processes):
+                        try:
+                            render = renderer.submit(render_shard, location,
+                                                     texts, shard, directory)
+                        except Exception:
+                            # The pool is broken, fail the jobs it refused.
+                            error = traceback.format_exc()
+                            for index, _ in shard:
+                                yield index, None, error
+                            continue
+                        renders[render] = (location, texts, responses, shard)
+                        pending.add(render)
+                    continue
+                location, texts, responses, shard = renders.pop(future)
+                try:
+                    _, decoded, results, summary = future.result()
+                except Exception:
+                    # The worker process died, fail the whole shard.
+                    error = traceback.format_exc()
+                    for index, _ in shard:
+                        yield index, None, error
+                    continue
+                weather_metrics.METRICS.merge(summary)
+                if decoded and location not in cached:
+                    cached.add(location)
+                    for feature, response in responses.items():
+                        weather_scheduler.cache_response(
+                            response, feature, location, texts[feature],
+                            cache)
+                for result in results:
+                    yield result
+
+
+def get_output_name(job):
+    """Return the output file name of the job dict, or None when the job is
+    not valid and the worker reports the error of it."""
+    try:
+        _, day, location, start = weather_scheduler.parse_job(job)
+    except Exception:
+        return None
+    return job.get('output') or \
+        weather_scheduler.get_output_name(day, location, start)
+
+
+def split_jobs(jobs, count):
+    """Return up to count lists of the (index, job) list, in turns so every
+    list has about the same number of jobs."""
+    count = min(count, len(jobs))
+    return [jobs[start::count] for start in range(count)]